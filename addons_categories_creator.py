@@ -1,54 +1,149 @@
-import pandas as pd
 import asyncio
 from playwright.async_api import async_playwright
 import os 
-from credentials import email, password, vendor_name
+from credentials import email, password, vendor_name, portal_url, upload_backend, upload_concurrency
+from readiness import readiness
+from browser_pool import launch_browser
+from browser_profile import profile, network_metrics
+from instrumentation import instrumentation
+from ingestion import read_records
+from run_journal import RunJournal
+from recovery import recovery, wait_for_submit, RowFailed, VALIDATION
+from catalog_index import ListingIndex, crawl_listing_async
+from items_addons_linker import ItemsAddonsLinker
 
 desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
-desktop_path = desktop_path.replace("\\", "\\\\")
 
-LOGIN_URL = "https://vendor.elitewherego.com/login"
-MAIN_URL = "https://vendor.elitewherego.com/addoncategories"
-EXCEL_PATH = f"{desktop_path}\\{vendor_name}\\addons\\addon_cat.xlsx"
+LOGIN_URL = f"{portal_url}/login"
+MAIN_URL = f"{portal_url}/addoncategories"
+EXCEL_PATH = os.path.join(desktop_path, vendor_name, "addons", "addon_cat.xlsx")
+JOURNAL_PATH = os.path.join(desktop_path, vendor_name, "addons", "journal.sqlite")
+STORAGE_STATE_PATH = os.path.join(desktop_path, vendor_name, "addons", "portal_state.json")
 
 def read_excel_to_dict_list(file_path: str) -> list:
-    df = pd.read_excel(file_path, usecols=[0, 1, 2], names=["category", "category_status", "count"], skiprows=0, header=[0])
-    return df.to_dict(orient='records')
+    return read_records(file_path, usecols=[0, 1, 2], names=["category", "category_status", "count"])
 
-async def automate(USERNAME, PASSWORD):
-    excel_data = read_excel_to_dict_list(EXCEL_PATH)
+def format_count(count):
+    """A count as format_number writes it, so 2.0 read from a float column is sent as 2."""
+    try:
+        return ItemsAddonsLinker.format_number(float(str(count).strip()))
+    except ValueError:
+        return str(count)
+
+def category_form(row):
+    form = {"name": row['category'], "status": "Active", "is_required": row['category_status']}
+    if(row['category_status'] == 'No'):
+        form["count"] = format_count(row['count'])
+    return form
+
+def category_key(row):
+    return (row['category'],)
+
+# Position of category_key's value in the categories listing (name, status, required, count).
+LISTING_COLUMNS = (0,)
+
+async def login(page, username, password, storage_state_path=None):
+    """Log in unless the saved session is still signed in, then save the session for the next run."""
+    await instrumentation.goto(page, LOGIN_URL)
+    if "/login" in page.url:
+        await page.fill("#email", username)
+        await page.fill("input[type='password']", password)
+        await page.click("button[type='submit']")
+        await page.wait_for_url(f"{portal_url}/")
+        if storage_state_path:
+            await page.context.storage_state(path=storage_state_path)
+
+async def open_create_form(page):
+    await instrumentation.goto(page, f"{MAIN_URL}/create", name="goto_create")
+
+async def row_listed(page, row):
+    """Whether the categories listing already has the row, for a submit whose outcome never showed."""
+    return ListingIndex(await crawl_listing_async(page, MAIN_URL), LISTING_COLUMNS).contains(*category_key(row))
+
+async def upload_row(page, row):
+    if page.url.rstrip("/") != f"{MAIN_URL}/create":
+        await page.click(f"a[href='{MAIN_URL}/create']")
+    await readiness.wait_for_selector(page, 'div.max-w-3xl.overflow-hidden.bg-white.rounded.shadow', name="create_form")
+
+    await page.fill("#name", row['category'])
+    await page.select_option("#status", "Active")
+    await page.select_option("#is_required", row['category_status'])
+    if(row['category_status'] == 'No'):
+        await page.fill("#count", format_count(row['count']))
+
+    await page.click("button[type='submit']")
+    await wait_for_submit(page, 'table.w-full.whitespace-nowrap')
+
+async def upload_rows(page, rows, journal, relogin, final_pass=False):
+    """Upload rows through the create form and return the ones that failed for a retryable reason."""
+    retry_rows = []
+    for row in rows:
+        try:
+            with instrumentation.span("upload_row"):
+                await recovery.run_async(lambda: upload_row(page, row), page, relogin, open_create_form,
+                                         lambda page: row_listed(page, row))
+            instrumentation.count("rows_uploaded")
+            journal.record(row, "done")
+        except RowFailed as e:
+            created = await recovery.created_after(e, lambda: row_listed(page, row))
+            await open_create_form(page)
+            if created:
+                instrumentation.count("rows_uploaded")
+                journal.record(row, "done")
+                continue
+            if e.kind != VALIDATION and not final_pass and created is not None:
+                retry_rows.append(row)
+                continue
+            print("Error:", e)
+            journal.record(row, "failed", e)
+            instrumentation.count("rows_failed")
+    return retry_rows
+
+async def automate(USERNAME, PASSWORD, backend=upload_backend, excel_path=EXCEL_PATH, journal_path=JOURNAL_PATH,
+                   cdp_endpoint=None, storage_state_path=STORAGE_STATE_PATH):
+    journal = RunJournal(journal_path, "addon_categories")
+    excel_data = journal.pending(read_excel_to_dict_list(excel_path))
+    if backend == 'http':
+        from portal_http import submit_rows
+        try:
+            excel_data = await submit_rows(USERNAME, PASSWORD, "/addoncategories", excel_data, category_form, upload_concurrency,
+                                       existing_key=category_key, existing_columns=LISTING_COLUMNS,
+                                       on_result=journal.record)
+        except Exception as e:
+            print("Error:", e)
+        if not excel_data:
+            print(journal.summary())
+            instrumentation.finish()
+            return journal.summary()
+        print(f"Falling back to the browser for {len(excel_data)} rows")
     async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        context = await browser.new_context()
+        browser = await launch_browser(p, cdp_endpoint)
+        context = await profile.new_context_async(browser, storage_state_path)
         page = await context.new_page()
+        relogin = lambda page: login(page, USERNAME, PASSWORD, storage_state_path)
+        await relogin(page)
         
-        await page.goto(LOGIN_URL)
-        await page.fill("#email", USERNAME)
-        await page.fill("input[type='password']", PASSWORD)
-        await page.click("button[type='submit']")
-        await page.wait_for_url('https://vendor.elitewherego.com/')
-        
-        await page.goto(MAIN_URL)
-        
+        listing = ListingIndex(await crawl_listing_async(page, MAIN_URL), LISTING_COLUMNS)
+        new_rows = []
         for row in excel_data:
-            try:
-                await page.click("a[href='https://vendor.elitewherego.com/addoncategories/create']")
-                await page.wait_for_selector('div.max-w-3xl.overflow-hidden.bg-white.rounded.shadow')
-                
-                await page.fill("#name", row['category'])
-                await page.select_option("#status", "Active")
-                await page.select_option("#is_required", row['category_status'])
-                if(row['category_status'] == 'No'):
-                    await page.fill("#count", str(row['count']))
-                
-                await page.click("button[type='submit']")
-                await page.wait_for_selector('table.w-full.whitespace-nowrap')
-            except Exception as e:
-                print("Error:", e)
-                await page.goto(MAIN_URL)
-                await page.wait_for_selector('table.w-full.whitespace-nowrap')
-                continue
+            if listing.contains(*category_key(row)):
+                journal.record(row, "exists")
+                instrumentation.count("rows_existing")
+            else:
+                new_rows.append(row)
+        
+        await instrumentation.goto(page, MAIN_URL)
+        retry_rows = await upload_rows(page, new_rows, journal, relogin)
+        if retry_rows:
+            print(f"Retrying {len(retry_rows)} failed rows")
+            await upload_rows(page, retry_rows, journal, relogin, final_pass=True)
         
         await browser.close()
+    print(journal.summary())
+    readiness.print_report()
+    network_metrics.print_report()
+    instrumentation.finish()
+    return journal.summary()
 
-asyncio.run(automate(email, password))
+if __name__ == "__main__":
+    asyncio.run(automate(email, password))
@@ -1,57 +1,182 @@
-import pandas as pd
 import asyncio
 from playwright.async_api import async_playwright
 import os
-from credentials import email, password, vendor_name
+from credentials import email, password, vendor_name, portal_url, upload_backend, upload_concurrency, upload_create_categories
+from readiness import readiness
+from browser_pool import launch_browser
+from browser_profile import profile, network_metrics
+from instrumentation import instrumentation
+from ingestion import read_records
+from run_journal import RunJournal
+from recovery import recovery, wait_for_submit, RowFailed, VALIDATION
+from catalog_index import ListingIndex, crawl_listing_async, read_options_async
+from text_normalization import normalize_key
+import addons_categories_creator
 
 desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
-desktop_path = desktop_path.replace("\\", "\\\\")
 
-LOGIN_URL = "https://vendor.elitewherego.com/login"
-MAIN_URL = "https://vendor.elitewherego.com/addons"
-EXCEL_PATH = f"{desktop_path}\\{vendor_name}\\addons\\addons.xlsx"
+LOGIN_URL = f"{portal_url}/login"
+MAIN_URL = f"{portal_url}/addons"
+EXCEL_PATH = os.path.join(desktop_path, vendor_name, "addons", "addons.xlsx")
+JOURNAL_PATH = os.path.join(desktop_path, vendor_name, "addons", "journal.sqlite")
+STORAGE_STATE_PATH = os.path.join(desktop_path, vendor_name, "addons", "portal_state.json")
 
 def read_excel_to_dict_list(file_path: str) -> list:
-    df = pd.read_excel(file_path, usecols=[0, 1, 2], names=["addon_category", "addon_name", "addon_price"], skiprows=0, header=[0])
-    return df.to_dict(orient='records')
+    return read_records(file_path, usecols=[0, 1, 2], names=["addon_category", "addon_name", "addon_price"])
 
-async def automate(USERNAME, PASSWORD):
-    excel_data = read_excel_to_dict_list(EXCEL_PATH)
+def addon_form(row):
+    return {"name": row['addon_name'], "price": str(row['addon_price']),
+            "addon_category_id": f"{row['addon_category']}", "status": "Active"}
+
+def addon_key(row):
+    return (row['addon_category'], row['addon_name'])
+
+# Positions of addon_key's values in the addons listing (name, category, price).
+LISTING_COLUMNS = (1, 0)
+
+async def login(page, username, password, storage_state_path=None):
+    """Log in unless the saved session is still signed in, then save the session for the next run."""
+    await instrumentation.goto(page, LOGIN_URL)
+    if "/login" in page.url:
+        await page.fill("#email", username)
+        await page.fill("input[type='password']", password)
+        await page.click("button[type='submit']")
+        await page.wait_for_url(f"{portal_url}/")
+        if storage_state_path:
+            await page.context.storage_state(path=storage_state_path)
+
+async def open_create_form(page):
+    await instrumentation.goto(page, f"{MAIN_URL}/create", name="goto_create")
+
+async def read_categories(page):
+    """Load the create form once and index its category options by normalized name."""
+    await open_create_form(page)
+    await readiness.wait_for_selector(page, '#addon_category_id', name="create_form", state="attached")
+    return await read_options_async(page, "#addon_category_id")
+
+async def create_missing_categories(page, missing, relogin, excel_path, journal_path):
+    """Create the missing categories that addon_cat.xlsx next to the addons export describes; returns how many."""
+    categories_path = os.path.join(os.path.dirname(excel_path), "addon_cat.xlsx")
+    if not os.path.exists(categories_path):
+        return 0
+    wanted = {normalize_key(name) for name in missing}
+    rows = [row for row in addons_categories_creator.read_excel_to_dict_list(categories_path)
+            if normalize_key(row['category']) in wanted]
+    journal = RunJournal(journal_path, "addon_categories")
+    await addons_categories_creator.open_create_form(page)
+    for row in rows:
+        try:
+            await recovery.run_async(lambda: addons_categories_creator.upload_row(page, row), page, relogin,
+                                     addons_categories_creator.open_create_form,
+                                     lambda page: addons_categories_creator.row_listed(page, row))
+            journal.record(row, "done")
+        except RowFailed as e:
+            print("Error:", e)
+            journal.record(row, "failed", e)
+            await addons_categories_creator.open_create_form(page)
+    return len(rows)
+
+async def row_listed(page, row):
+    """Whether the addons listing already has the row, for a submit whose outcome never showed."""
+    return ListingIndex(await crawl_listing_async(page, MAIN_URL), LISTING_COLUMNS).contains(*addon_key(row))
+
+async def upload_row(page, row, category_id):
+    if page.url.rstrip("/") != f"{MAIN_URL}/create":
+        await page.click(f"a[href='{MAIN_URL}/create']")
+    await readiness.wait_for_selector(page, '#addon_category_id', name="create_form", state="attached")
+    await readiness.wait_for_selector(page, '#name', name="create_form_fields")
+
+    await page.fill("#name", row['addon_name'])
+    await page.fill("#price", str(row['addon_price']))
+    await page.select_option("#addon_category_id", value=category_id)
+    await page.select_option("#status", "Active")
+
+    await page.click("button[type='submit']")
+    await wait_for_submit(page, 'table.w-full.whitespace-nowrap')
+
+async def upload_rows(page, rows, categories, journal, relogin, final_pass=False):
+    """Upload rows through the create form and return the ones that failed for a retryable reason."""
+    retry_rows = []
+    for row in rows:
+        category_id = categories.resolve(row['addon_category'])
+        try:
+            with instrumentation.span("upload_row"):
+                await recovery.run_async(lambda: upload_row(page, row, category_id), page, relogin, open_create_form,
+                                         lambda page: row_listed(page, row))
+            instrumentation.count("rows_uploaded")
+            journal.record(row, "done")
+        except RowFailed as e:
+            created = await recovery.created_after(e, lambda: row_listed(page, row))
+            await open_create_form(page)
+            if created:
+                instrumentation.count("rows_uploaded")
+                journal.record(row, "done")
+                continue
+            if e.kind != VALIDATION and not final_pass and created is not None:
+                retry_rows.append(row)
+                continue
+            print("Error:", e)
+            journal.record(row, "failed", e)
+            instrumentation.count("rows_failed")
+    return retry_rows
+
+async def automate(USERNAME, PASSWORD, backend=upload_backend, excel_path=EXCEL_PATH, journal_path=JOURNAL_PATH,
+                   cdp_endpoint=None, storage_state_path=STORAGE_STATE_PATH, create_categories=upload_create_categories):
+    journal = RunJournal(journal_path, "addons")
+    excel_data = journal.pending(read_excel_to_dict_list(excel_path))
+    if backend == 'http':
+        from portal_http import submit_rows
+        try:
+            excel_data = await submit_rows(USERNAME, PASSWORD, "/addons", excel_data, addon_form, upload_concurrency,
+                                       existing_key=addon_key, existing_columns=LISTING_COLUMNS,
+                                       on_result=journal.record)
+        except Exception as e:
+            print("Error:", e)
+        if not excel_data:
+            print(journal.summary())
+            instrumentation.finish()
+            return journal.summary()
+        print(f"Falling back to the browser for {len(excel_data)} rows")
     async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        context = await browser.new_context()
+        browser = await launch_browser(p, cdp_endpoint)
+        context = await profile.new_context_async(browser, storage_state_path)
         page = await context.new_page()
+        relogin = lambda page: login(page, USERNAME, PASSWORD, storage_state_path)
+        await relogin(page)
         
-        await page.goto(LOGIN_URL)
-        await page.fill("#email", USERNAME)
-        await page.fill("input[type='password']", PASSWORD)
-        await page.click("button[type='submit']")
-        await page.wait_for_url('https://vendor.elitewherego.com/')
+        listing = ListingIndex(await crawl_listing_async(page, MAIN_URL), LISTING_COLUMNS)
+        new_rows = []
+        for row in excel_data:
+            if listing.contains(*addon_key(row)):
+                journal.record(row, "exists")
+                instrumentation.count("rows_existing")
+            else:
+                new_rows.append(row)
         
-        await page.goto(MAIN_URL)
+        categories = await read_categories(page)
+        missing = categories.unresolved(row['addon_category'] for row in new_rows)
+        if missing and create_categories and await create_missing_categories(page, missing, relogin, excel_path, journal_path):
+            categories = await read_categories(page)
+            missing = categories.unresolved(missing)
+        if missing:
+            print(f"[Categories] not in the portal, skipping their addons: {', '.join(missing)}")
+            for row in new_rows:
+                if categories.resolve(row['addon_category']) is None:
+                    journal.record(row, "failed", "category not in the portal")
+                    instrumentation.count("rows_failed")
+            new_rows = [row for row in new_rows if categories.resolve(row['addon_category']) is not None]
         
-        for row in excel_data:
-            try:
-                await page.click("a[href='https://vendor.elitewherego.com/addons/create']")
-                await page.wait_for_selector('#name')
-                await page.wait_for_selector('#price')
-                await page.wait_for_selector('#status')
-                await page.wait_for_selector('#addon_category_id')
-                
-                await page.fill("#name", row['addon_name'])
-                await page.fill("#price", str(row['addon_price']))
-                await page.select_option("#addon_category_id", f"{row['addon_category']}")
-                await page.select_option("#status", "Active")
-                
-                await page.click("button[type='submit']")
-                await page.wait_for_selector('table.w-full.whitespace-nowrap')
-            except Exception as e:
-                print("Error:", e)
-                
-                await page.goto(MAIN_URL)
-                await page.wait_for_selector('table.w-full.whitespace-nowrap')
-                continue
+        retry_rows = await upload_rows(page, new_rows, categories, journal, relogin)
+        if retry_rows:
+            print(f"Retrying {len(retry_rows)} failed rows")
+            await upload_rows(page, retry_rows, categories, journal, relogin, final_pass=True)
         
         await browser.close()
+    print(journal.summary())
+    readiness.print_report()
+    network_metrics.print_report()
+    instrumentation.finish()
+    return journal.summary()
 
-asyncio.run(automate(email, password))
+if __name__ == "__main__":
+    asyncio.run(automate(email, password))
@@ -0,0 +1,205 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from playwright.sync_api import sync_playwright
+import credentials
+import addons_categories_creator
+import addons_uploader
+import bulk_import
+from browser_pool import BrowserPool, launch_browser
+from browser_profile import profile, network_metrics
+from instrumentation import instrumentation
+from deliveroo_addons_scraper import DeliverooAddonScraper
+from items_addons_linker import ItemsAddonsLinker
+from pipeline import StreamingPipeline
+from readiness import metrics_scope, readiness
+from run_journal import clear_journal
+from talabat_addons_scraper import TalabatAddonScraper
+
+STAGES = ["scrape", "categories", "addons", "link"]
+
+desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
+
+
+def load_manifest(path):
+    """Read vendors from a .json list or a .csv with vendor_name, vendor_url and optional platform, email, password, stages."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as manifest_file:
+            vendors = list(csv.DictReader(manifest_file))
+    else:
+        with open(path, encoding="utf-8") as manifest_file:
+            vendors = json.load(manifest_file)
+
+    for vendor in vendors:
+        if not vendor.get("vendor_name") or not vendor.get("vendor_url"):
+            raise ValueError(f"manifest entry needs vendor_name and vendor_url: {vendor}")
+        vendor["platform"] = vendor.get("platform") or ("deliveroo" if "deliveroo" in vendor["vendor_url"] else "talabat")
+        vendor["email"] = vendor.get("email") or credentials.email
+        vendor["password"] = vendor.get("password") or credentials.password
+        stages = vendor.get("stages") or STAGES
+        vendor["stages"] = stages.split() if isinstance(stages, str) else stages
+    return vendors
+
+
+def vendor_dir(vendor):
+    return os.path.join(desktop_path, vendor['vendor_name'], "addons")
+
+
+def journal_counts(summary):
+    """(rows failed, rows seen) from a journal summary."""
+    return summary.get("failed", 0), sum(summary.values())
+
+
+def link_counts(results):
+    """(items not linked, items seen) from the linker's results."""
+    return sum(1 for status, _ in results.values() if status != "linked"), len(results)
+
+
+def run_scrape(vendor, cdp_endpoint, on_records=None, export_excel=True):
+    """Scrape the vendor's menu and return (items failed, items seen)."""
+    base_path = vendor_dir(vendor)
+    os.makedirs(base_path, exist_ok=True)
+    snapshot_path = os.path.join(base_path, "menu_snapshot.json") if credentials.scraper_incremental else None
+    if vendor["platform"] == "deliveroo":
+        with sync_playwright() as p:
+            browser = launch_browser(p, cdp_endpoint)
+            context = profile.new_context(browser, geolocation=DeliverooAddonScraper.GEOLOCATION, permissions=["geolocation"])
+            counts = DeliverooAddonScraper(vendor["vendor_url"], base_path, context, engine=credentials.scraper_engine,
+                                           snapshot_path=snapshot_path, on_records=on_records, export_excel=export_excel,
+                                           flush_rows=credentials.scraper_flush_rows).start()
+            browser.close()
+        return counts
+    return TalabatAddonScraper(vendor["vendor_url"], base_path, workers=credentials.scraper_workers,
+                               engine=credentials.scraper_engine, snapshot_path=snapshot_path,
+                               cdp_endpoint=cdp_endpoint, on_records=on_records, export_excel=export_excel,
+                               flush_rows=credentials.scraper_flush_rows).start()
+
+
+def run_categories(vendor, cdp_endpoint):
+    return journal_counts(asyncio.run(addons_categories_creator.automate(
+        vendor["email"], vendor["password"], excel_path=os.path.join(vendor_dir(vendor), "addon_cat.xlsx"),
+        journal_path=os.path.join(vendor_dir(vendor), "journal.sqlite"), cdp_endpoint=cdp_endpoint,
+        storage_state_path=os.path.join(vendor_dir(vendor), "portal_state.json"))))
+
+
+def run_addons(vendor, cdp_endpoint):
+    return journal_counts(asyncio.run(addons_uploader.automate(
+        vendor["email"], vendor["password"], excel_path=os.path.join(vendor_dir(vendor), "addons.xlsx"),
+        journal_path=os.path.join(vendor_dir(vendor), "journal.sqlite"), cdp_endpoint=cdp_endpoint,
+        storage_state_path=os.path.join(vendor_dir(vendor), "portal_state.json"))))
+
+
+def run_link(vendor, cdp_endpoint):
+    return link_counts(ItemsAddonsLinker(
+        vendor["email"], vendor["password"], os.path.join(vendor_dir(vendor), "items_addons.xlsx"),
+        workers=credentials.linker_workers, use_catalog_index=credentials.linker_catalog_index,
+        catalog_ttl=credentials.linker_catalog_ttl, journal_path=os.path.join(vendor_dir(vendor), "journal.sqlite"),
+        cdp_endpoint=cdp_endpoint, storage_state_path=os.path.join(vendor_dir(vendor), "portal_state.json")).run())
+
+
+def run_stream(vendor, cdp_endpoint):
+    """Scrape, create categories, upload addons and link items in one streaming pass instead of four stages."""
+    base_path = vendor_dir(vendor)
+    scrape_counts = []
+    pipeline = StreamingPipeline(
+        lambda on_records: scrape_counts.append(run_scrape(vendor, cdp_endpoint, on_records, export_excel=credentials.pipeline_excel)),
+        vendor["email"], vendor["password"], base_path, link="link" in vendor["stages"],
+        storage_state_path=os.path.join(base_path, "portal_state.json"), cdp_endpoint=cdp_endpoint,
+        use_catalog_index=credentials.linker_catalog_index, catalog_ttl=credentials.linker_catalog_ttl)
+    link_results = pipeline.run()
+    counts = scrape_counts + [journal_counts(pipeline.category_journal.summary()),
+                              journal_counts(pipeline.addon_journal.summary()), link_counts(link_results)]
+    return tuple(map(sum, zip(*counts)))
+
+
+def run_import(vendor, cdp_endpoint):
+    """Send categories, addons and links in one import request, or run their stages if the portal has no import page."""
+    summary = asyncio.run(bulk_import.run_import(vendor["email"], vendor["password"], vendor_dir(vendor)))
+    if summary is None:
+        counts = [STAGE_RUNNERS[stage](vendor, cdp_endpoint) for stage in IMPORT_STAGES if stage in vendor["stages"]]
+        return tuple(map(sum, zip(*counts))) if counts else (0, 0)
+    failed = len(summary.get('errors', [])) + summary['rejected']
+    return failed, failed + sum(summary.get('created', {}).values())
+
+
+STAGE_RUNNERS = {"scrape": run_scrape, "categories": run_categories, "addons": run_addons, "link": run_link,
+                 "stream": run_stream, "import": run_import}
+IMPORT_STAGES = ["categories", "addons", "link"]
+
+
+def run_vendor(pool, vendor, stages, stream=False, bulk=False, fresh=False):
+    """Run the vendor's stages in order on a leased browser, stopping at the first stage that fails.
+
+    Every runner returns (failed, total); a stage where some rows failed is reported partial, and one
+    where every row failed counts as failed. Metrics are recorded under the vendor's own scope as well.
+
+    With stream, a run that starts with scrape does every stage in one streaming pipeline pass. With
+    bulk, the upload stages become one import request. With fresh, the vendor's journal is cleared
+    first, so rows done in earlier runs are uploaded and linked again.
+    """
+    results = {}
+    if fresh:
+        clear_journal(os.path.join(vendor_dir(vendor), "journal.sqlite"))
+    stages = [stage for stage in STAGES if stage in vendor["stages"] and stage in stages]
+    if stream and "scrape" in stages:
+        stages = ["stream"]
+    elif bulk and any(stage in IMPORT_STAGES for stage in stages):
+        stages = [stage for stage in stages if stage not in IMPORT_STAGES] + ["import"]
+    with pool.lease() as cdp_endpoint, metrics_scope(vendor["vendor_name"]):
+        for stage in stages:
+            start = time.monotonic()
+            print(f"[{vendor['vendor_name']}] {stage} started")
+            try:
+                with instrumentation.span(f"stage_{stage}", vendor=vendor["vendor_name"]):
+                    failed, total = STAGE_RUNNERS[stage](vendor, cdp_endpoint)
+            except Exception as e:
+                print(f"[{vendor['vendor_name']}] {stage} failed: {e}")
+                results[stage] = f"failed: {e}"
+                break
+            elapsed = time.monotonic() - start
+            if failed and failed == total:
+                print(f"[{vendor['vendor_name']}] {stage} failed: all {total} rows failed")
+                results[stage] = f"failed: all {total} rows failed ({elapsed:.0f}s)"
+                break
+            results[stage] = f"partial: {failed}/{total} failed ({elapsed:.0f}s)" if failed else f"ok ({elapsed:.0f}s)"
+    return results
+
+
+def run_batch(vendors, browsers=2, stages=STAGES, headless=True, stream=False, bulk=False, fresh=False):
+    """Run the pipeline for every vendor, at most `browsers` vendors at a time, each on a warm pooled browser."""
+    with BrowserPool(min(browsers, len(vendors)) or 1, headless=headless) as pool:
+        with ThreadPoolExecutor(max_workers=pool.size) as executor:
+            results = list(executor.map(lambda vendor: run_vendor(pool, vendor, stages, stream, bulk, fresh), vendors))
+    return {vendor["vendor_name"]: result for vendor, result in zip(vendors, results)}
+
+
+def print_batch_results(results):
+    for vendor_name, stage_results in results.items():
+        print(f"{vendor_name}: " + ", ".join(f"{stage} {status}" for stage, status in stage_results.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run scrape -> create categories -> upload addons -> link items for many vendors.")
+    parser.add_argument("manifest", help="vendors as .json or .csv")
+    parser.add_argument("--browsers", type=int, default=credentials.batch_browsers, help="warm browsers (vendors run at once)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--headed", action="store_true", help="show the pooled browsers")
+    parser.add_argument("--stream", action="store_true", default=credentials.pipeline_stream,
+                        help="upload and link while scraping instead of stage by stage through the Excel files")
+    parser.add_argument("--bulk", action="store_true", help="send categories, addons and links as one portal import")
+    parser.add_argument("--fresh", action="store_true", help="clear each vendor's journal and redo rows done in earlier runs")
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    with instrumentation.defer_files():
+        results = run_batch(load_manifest(args.manifest), args.browsers, args.stages, headless=credentials.browser_headless and not args.headed,
+                            stream=args.stream, bulk=args.bulk, fresh=args.fresh)
+    print_batch_results(results)
+    print(f"Batch finished in {time.monotonic() - start:.0f}s")
+    readiness.print_report()
+    network_metrics.print_report()
+    instrumentation.finish()
@@ -0,0 +1,75 @@
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_normalization import addon_match_key
+
+SIZES = [(50, 500), (200, 2_000), (500, 5_000)]
+
+
+def sanitize_text(text, allow_spaces=True):
+    allowed_chars = r"[^a-zA-Z0-9_\-.\\ ]"
+    sanitized = re.sub(allowed_chars, "", text)
+    sanitized = re.sub(r"\s+", " ", sanitized).strip()
+    if not allow_spaces:
+        sanitized = sanitized.replace(" ", "_")
+    return sanitized
+
+
+def normalize_text(text):
+    return "".join(text.lower().split())
+
+
+def make_tables(attribute_count, row_count):
+    """Portal addon rows and spreadsheet addon attributes, every attribute matching one row near the end."""
+    rows = [{"category": f"Addon Category {i % 60}", "status": "Yes" if i % 2 else "No",
+             "name": f"Addon ({i})", "price": f"{i % 9}", "link": f"/addaddon/{i}"} for i in range(row_count)]
+    attributes = [["Menu Category", row["category"], row["name"], row["price"], row["status"]]
+                  for row in rows[-attribute_count:]]
+    return rows, attributes
+
+
+def run_nested(rows, attributes):
+    addon_data = [dict(row, category=sanitize_text(normalize_text(row["category"])),
+                       name=sanitize_text(normalize_text(row["name"]))) for row in rows]
+    links = []
+    for addon_attr in attributes:
+        for addon in addon_data:
+            if (addon["category"] == sanitize_text(normalize_text(addon_attr[1])) and
+                addon["name"] == sanitize_text(normalize_text(addon_attr[2])) and
+                addon["price"] == str(addon_attr[3]) and
+                addon["status"] == addon_attr[4]):
+                links.append(addon["link"])
+                break
+    return links
+
+
+def run_keyed(rows, attributes):
+    addon_data = {}
+    for row in rows:
+        addon_data.setdefault(addon_match_key(row["category"], row["name"], row["price"], row["status"]), row)
+    links = []
+    for addon_attr in attributes:
+        addon = addon_data.get(addon_match_key(addon_attr[1], addon_attr[2], addon_attr[3], addon_attr[4]))
+        if addon is not None:
+            links.append(addon["link"])
+    return links
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    print(f"{'attrs x rows':>14} {'nested (s)':>12} {'keyed (s)':>12}")
+    for attribute_count, row_count in SIZES:
+        rows, attributes = make_tables(attribute_count, row_count)
+        nested_time, nested_links = timed(run_nested, rows, attributes)
+        keyed_time, keyed_links = timed(run_keyed, rows, attributes)
+        assert nested_links == keyed_links, "keyed matching picked different addons"
+        print(f"{f'{attribute_count} x {row_count}':>14} {nested_time:12.4f} {keyed_time:12.4f}")
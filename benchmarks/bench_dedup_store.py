@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup_store import DedupStore
+
+KEYS = ['category_name', 'item_name', 'addon_category', 'addon_name', 'addon_price', 'category_status']
+SIZES = [1_000, 5_000, 10_000, 100_000]
+LINEAR_LIMIT = 5_000
+
+
+def make_rows(n):
+    """Build n item x addon rows with roughly 10% duplicates, like a real menu scrape."""
+    unique = max(1, int(n * 0.9))
+    return [
+        {'category_name': f"Category {i % 25}", 'item_name': f"Item {i % (unique // 5 + 1)}",
+         'addon_category': f"Addon Category {i % 40}", 'addon_name': f"Addon {i % unique}",
+         'addon_price': f"{i % 17}.00", 'category_status': "Yes" if i % 3 else "No"}
+        for i in range(n)
+    ]
+
+
+def dict_exists(target_dict, data_list, keys):
+    return any(all(d.get(key) == target_dict.get(key) for key in keys) for d in data_list)
+
+
+def run_linear(rows):
+    data = []
+    for row in rows:
+        if not dict_exists(row, data, KEYS):
+            data.append(row)
+    return data
+
+
+def run_store(rows):
+    store = DedupStore(KEYS)
+    for row in rows:
+        store.add(row)
+    return list(store)
+
+
+def timed(func, rows):
+    start = time.perf_counter()
+    result = func(rows)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    print(f"{'rows':>8} {'linear (s)':>12} {'store (s)':>12}")
+    for size in SIZES:
+        rows = make_rows(size)
+        store_time, store_result = timed(run_store, rows)
+        if size <= LINEAR_LIMIT:
+            linear_time, linear_result = timed(run_linear, rows)
+            assert linear_result == store_result, "DedupStore changed the output order or contents"
+            linear_column = f"{linear_time:12.4f}"
+        else:
+            linear_column = f"{'skipped':>12}"
+        print(f"{size:>8} {linear_column} {store_time:12.4f}")
@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import credentials
+from fixture_sites import (StorefrontStub, deliveroo_page, expected_exports, expected_links, seed_portal, synthetic_menu,
+                           talabat_page)
+from portal_stub import PortalStub
+
+SIZES = [10, 100, 1000]
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_end_to_end.json")
+EMAIL, PASSWORD = "vendor@example.com", "secret"
+# Each run repeats its component until this much time has passed, so startup noise does not dominate.
+MIN_RUN_SECONDS = 1.0
+# Prices and counts pre-flight validation must keep out of a bulk import.
+BAD_NUMBERS = ["nan", "inf", "-inf", "1e999", "abc", ""]
+# The fixture storefront serves choices from localhost, which the live Talabat pattern would not match.
+FIXTURE_CHOICES_PATTERN = r"/talabat/choices/"
+
+
+def row_set(rows):
+    return {tuple(str(value) for value in row.values()) for row in rows}
+
+
+def same_rows(scraper, expected):
+    stores = [scraper.cat_attributes, scraper.addon_attributes, scraper.items_addons_attributes]
+    return all(row_set(store) == row_set(rows) for store, rows in zip(stores, expected))
+
+
+def rejects_bad_numbers():
+    """Whether pre-flight validation rejects every addon price and category count in BAD_NUMBERS."""
+    plan = bulk_import.ImportPlan()
+    plan.add_category({'category': "Sauces", 'category_status': "Yes", 'count': ""})
+    for value in BAD_NUMBERS:
+        plan.add_addon({'addon_category': "Sauces", 'addon_name': f"Dip {value}", 'addon_price': value})
+        plan.add_category({'category': f"Size {value}", 'category_status': "No", 'count': value})
+    return len(plan.problems) == 2 * len(BAD_NUMBERS) and len(plan.rows) == 1
+
+
+class Bench:
+    """One benchmark size: the fixture menu, the local sites, and the exports the upload stages read."""
+
+    def __init__(self, menu, storefront, portal, work_dir, scraper_workers=1):
+        self.menu = menu
+        self.storefront = storefront
+        self.portal = portal
+        self.work_dir = work_dir
+        self.scraper_workers = scraper_workers
+        self.expected = expected_exports(menu)
+        self.paths = {}
+        for rows, filename in zip(self.expected, ["addon_cat.xlsx", "addons.xlsx", "items_addons.xlsx"]):
+            self.paths[filename] = os.path.join(work_dir, filename)
+            append_rows_to_excel(self.paths[filename], rows)
+
+    def item_count(self):
+        return sum(len(category['items']) for category in self.menu['categories'])
+
+    def run_talabat(self, engine='dom'):
+        scraper = TalabatAddonScraper(f"{self.storefront.base_url}/talabat", tempfile.mkdtemp(dir=self.work_dir),
+                                      workers=self.scraper_workers, engine=engine)
+        scraper.NETWORK_URL_PATTERN = FIXTURE_CHOICES_PATTERN
+        scraper.start()
+        return self.item_count(), same_rows(scraper, self.expected)
+
+    def run_talabat_network(self):
+        return self.run_talabat(engine='network')
+
+    def run_deliveroo(self):
+        with sync_playwright() as p:
+            browser = launch_browser(p, headless=True)
+            scraper = DeliverooAddonScraper(f"{self.storefront.base_url}/deliveroo", tempfile.mkdtemp(dir=self.work_dir),
+                                            profile.new_context(browser))
+            scraper.start()
+            browser.close()
+        return self.item_count(), same_rows(scraper, expected_exports(self.menu, "deliveroo"))
+
+    def run_talabat_capture(self):
+        """Map the storefront's page state and per-item choices responses without a browser."""
+        capture = MenuResponseCapture(FIXTURE_CHOICES_PATTERN)
+        capture.add_html(talabat_page(self.menu))
+        for menu_item in talabat_menu_items(capture.payloads):
+            if menu_item['has_choices']:
+                capture.add_choices(menu_item['id'], self.storefront.talabat_choices(menu_item['id']))
+        scraper = TalabatAddonScraper(f"{self.storefront.base_url}/talabat", tempfile.mkdtemp(dir=self.work_dir),
+                                      engine='network', export_excel=False)
+        scraper.add_menu_items(talabat_menu_items(capture.payloads))
+        return self.item_count(), same_rows(scraper, self.expected)
+
+    def run_deliveroo_capture(self):
+        capture = MenuResponseCapture(DELIVEROO_URL_PATTERN)
+        capture.add_html(deliveroo_page(self.menu))
+        scraper = DeliverooAddonScraper(f"{self.storefront.base_url}/deliveroo", tempfile.mkdtemp(dir=self.work_dir), None,
+                                        engine='network', export_excel=False)
+        scraper.add_menu_items(deliveroo_menu_items(capture.payloads))
+        return self.item_count(), same_rows(scraper, expected_exports(self.menu, "deliveroo"))
+
+    def run_upload(self, module, filename, backend, **seed):
+        seed_portal(self.portal.state, self.menu, **seed)
+        journal_path = os.path.join(tempfile.mkdtemp(dir=self.work_dir), "journal.sqlite")
+        asyncio.run(module.automate(EMAIL, PASSWORD, backend=backend, excel_path=self.paths[filename],
+                                    journal_path=journal_path, storage_state_path=None))
+        return len(self.expected[["addon_cat.xlsx", "addons.xlsx"].index(filename)])
+
+    def run_categories(self, backend='browser'):
+        rows = self.run_upload(addons_categories_creator, "addon_cat.xlsx", backend)
+        return rows, len(self.portal.state.categories) == rows
+
+    def run_categories_http(self):
+        return self.run_categories('http')
+
+    def run_addons(self, backend='browser'):
+        rows = self.run_upload(addons_uploader, "addons.xlsx", backend, categories=True)
+        return rows, len(self.portal.state.addons) == rows
+
+    def run_addons_http(self):
+        return self.run_addons('http')
+
+    def run_linker(self, use_catalog_index=False):
+        seed_portal(self.portal.state, self.menu, addons=True)
+        ItemsAddonsLinker(EMAIL, PASSWORD, self.paths["items_addons.xlsx"], use_catalog_index=use_catalog_index,
+                          refresh_catalog=True).run()
+        return self.item_count(), len(self.portal.state.links) == expected_links(self.menu)
+
+    def run_linker_catalog(self):
+        return self.run_linker(use_catalog_index=True)
+
+    def run_bulk_import(self):
+        seed_portal(self.portal.state, self.menu)
+        asyncio.run(bulk_import.run_import(EMAIL, PASSWORD, self.work_dir))
+        state = self.portal.state
+        return sum(len(rows) for rows in self.expected), (len(state.addons) == len(self.expected[1])
+                                                          and len(state.links) == expected_links(self.menu)
+                                                          and rejects_bad_numbers())
+
+    def run_pipeline(self):
+        seed_portal(self.portal.state, self.menu)
+        base_path = tempfile.mkdtemp(dir=self.work_dir)
+
+        def scrape(on_records):
+            scraper = TalabatAddonScraper(f"{self.storefront.base_url}/talabat", base_path, engine='network',
+                                          on_records=on_records, export_excel=False)
+            scraper.NETWORK_URL_PATTERN = FIXTURE_CHOICES_PATTERN
+            scraper.start()
+
+        StreamingPipeline(scrape, EMAIL, PASSWORD, base_path, refresh_catalog=True).run()
+        return self.item_count(), len(self.portal.state.links) == expected_links(self.menu)
+
+
+# component: (Bench method, span whose latency is reported)
+COMPONENTS = {
+    "talabat": ("run_talabat", "modal_open"),
+    "talabat_network": ("run_talabat_network", "goto"),
+    "talabat_capture": ("run_talabat_capture", None),
+    "deliveroo": ("run_deliveroo", "modal_open"),
+    "deliveroo_capture": ("run_deliveroo_capture", None),
+    "categories": ("run_categories", "upload_row"),
+    "categories_http": ("run_categories_http", "http_submit"),
+    "addons": ("run_addons", "upload_row"),
+    "addons_http": ("run_addons_http", "http_submit"),
+    "linker": ("run_linker", "link_item"),
+    "linker_catalog": ("run_linker_catalog", "link_item"),
+    "bulk_import": ("run_bulk_import", "import_upload"),
+    "pipeline": ("run_pipeline", "pipeline_batch"),
+}
+
+
+def run_component(bench, component, verbose=False):
+    """Run a component back to back until MIN_RUN_SECONDS have passed and report its combined throughput."""
+    method, span = COMPONENTS[component]
+    instrumentation.reset()
+    output = io.StringIO()
+    units, correct, loops = 0, True, 0
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(sys.stdout if verbose else output):
+            while correct and (not loops or time.perf_counter() - start < MIN_RUN_SECONDS):
+                loop_units, correct = getattr(bench, method)()
+                units += loop_units
+                loops += 1
+    except Exception as e:
+        print(output.getvalue()[-2000:])
+        return {'error': f"{type(e).__name__}: {e}".splitlines()[0]}
+    seconds = time.perf_counter() - start
+    if not correct and not verbose:
+        print(output.getvalue()[-2000:])
+    stats = instrumentation.report()['spans'].get(span, {})
+    return {
+        'units': units,
+        'loops': loops,
+        'seconds': round(seconds, 3),
+        'per_minute': round(units / seconds * 60, 1),
+        'p50_ms': round(stats['p50_ms'], 1) if stats.get('p50_ms') is not None else None,
+        'p95_ms': round(stats['p95_ms'], 1) if stats.get('p95_ms') is not None else None,
+        'correct': correct,
+    }
+
+
+def warm_up(bench, component):
+    """Run a component once untimed, so imports, connections and caches do not land on the first measured run."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            getattr(bench, COMPONENTS[component][0])()
+        except Exception:
+            pass
+
+
+def summarize(runs):
+    """The median run of the repeats, with every run's throughput kept under 'runs'.
+
+    An error or a wrong result in any repeat is reported instead, since a median would hide it.
+    """
+    bad = [run for run in runs if 'error' in run or not run['correct']]
+    if bad:
+        return bad[0]
+    result = dict(sorted(runs, key=lambda run: run['per_minute'])[(len(runs) - 1) // 2])
+    result['per_minute'] = round(statistics.median(run['per_minute'] for run in runs), 1)
+    result['runs'] = [run['per_minute'] for run in runs]
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Return the result keys whose median throughput fell below the baseline's tolerance band.
+
+    The band reaches tolerance below the baseline median, or down to the baseline's slowest repeat
+    when its own runs varied more than that.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base or 'per_minute' not in result:
+            continue
+        floor = min([base['per_minute'] * (1 - tolerance)] + base.get('runs', []))
+        if result['per_minute'] < floor:
+            regressions.append(key)
+    return regressions
+
+
+def missing_baseline(baseline, components, sizes):
+    """The component@size keys with no baseline entry, or one whose output did not match the fixture."""
+    return [f"{component}@{size}" for size in sizes for component in components
+            if not baseline.get(f"{component}@{size}", {}).get('correct')]
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(path, results):
+    """Merge results into the baseline file, so a partial run only replaces the entries it measured."""
+    baseline = load_baseline(path)
+    baseline.setdefault('results', {}).update({key: result for key, result in results.items()
+                                               if 'error' not in result and result['correct']})
+    baseline['environment'] = {'python': platform.python_version(), 'platform': platform.platform(),
+                               'saved_at': time.strftime("%Y-%m-%d %H:%M:%S")}
+    with open(path, "w", encoding="utf-8") as baseline_file:
+        json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the scrapers, uploaders and linker against local fixture sites.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="menu sizes in items (10 to 5000)")
+    parser.add_argument("--components", nargs="+", choices=list(COMPONENTS), default=list(COMPONENTS))
+    parser.add_argument("--latency-ms", type=int, default=0, help="delay added to each storefront choices request")
+    parser.add_argument("--scraper-workers", type=int, default=1)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed throughput drop before a regression")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per component and size; the median is compared")
+    parser.add_argument("--verbose", action="store_true", help="show the scripts' own output")
+    parser.add_argument("--check-baseline", action="store_true",
+                        help="only check that every component and size has a correct baseline entry")
+    args = parser.parse_args()
+
+    if args.check_baseline:
+        missing = missing_baseline(load_baseline(args.baseline).get('results', {}), args.components, args.sizes)
+        for key in missing:
+            print(f"NO BASELINE {key}: record it with --save-baseline")
+        sys.exit(1 if missing else 0)
+
+    portal = PortalStub().start()
+    storefront = StorefrontStub(latency_ms=args.latency_ms).start()
+    # The scripts read their portal URL and browser settings from credentials at import time.
+    credentials.portal_url = portal.base_url
+    credentials.browser_headless = True
+    credentials.upload_concurrency = 8
+    from playwright.sync_api import sync_playwright
+    import addons_categories_creator
+    import addons_uploader
+    import bulk_import
+    from browser_pool import launch_browser
+    from browser_profile import profile
+    from deliveroo_addons_scraper import DeliverooAddonScraper
+    from excel_writer import append_rows_to_excel
+    from instrumentation import instrumentation
+    from items_addons_linker import ItemsAddonsLinker
+    from menu_capture import MenuResponseCapture, DELIVEROO_URL_PATTERN, deliveroo_menu_items, talabat_menu_items
+    from pipeline import StreamingPipeline
+    from talabat_addons_scraper import TalabatAddonScraper
+
+    baseline = load_baseline(args.baseline).get('results', {})
+    results = {}
+    warmed = set()
+    print(f"{'component':<16} {'items':>6} {'units':>7} {'seconds':>9} {'per min':>10} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'ok':>3} {'vs baseline':>12}")
+    try:
+        for size in args.sizes:
+            menu = synthetic_menu(size)
+            storefront.menu = menu
+            with tempfile.TemporaryDirectory() as work_dir:
+                bench = Bench(menu, storefront, portal, work_dir, args.scraper_workers)
+                for component in args.components:
+                    key = f"{component}@{size}"
+                    if component not in warmed:
+                        warm_up(bench, component)
+                        warmed.add(component)
+                    runs = [run_component(bench, component, args.verbose) for _ in range(args.repeat)]
+                    result = results[key] = summarize(runs)
+                    if 'error' in result:
+                        print(f"{component:<16} {size:>6} error: {result['error']}")
+                        continue
+                    base = baseline.get(key)
+                    change = f"{result['per_minute'] / base['per_minute'] - 1:+.0%}" if base else "-"
+                    print(f"{component:<16} {size:>6} {result['units']:>7} {result['seconds']:>9.2f} "
+                          f"{result['per_minute']:>10.1f} {result['p50_ms'] or 0:>8.1f} {result['p95_ms'] or 0:>8.1f} "
+                          f"{'yes' if result['correct'] else 'NO':>3} {change:>12}")
+    finally:
+        storefront.stop()
+        portal.stop()
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+    regressions = compare(results, baseline, args.tolerance)
+    failures = [key for key, result in results.items() if 'error' in result or not result['correct']]
+    for key in regressions:
+        print(f"REGRESSION {key}: {results[key]['per_minute']}/min vs baseline {baseline[key]['per_minute']}/min")
+    missing = [] if args.save_baseline else sorted(set(results) - set(baseline) - set(failures))
+    for key in missing:
+        print(f"NO BASELINE {key}: record it with --save-baseline")
+    for key in failures:
+        print(f"FAILED {key}: {results[key].get('error', 'output did not match the fixture')}")
+    sys.exit(1 if regressions or failures or missing else 0)
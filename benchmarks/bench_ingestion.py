@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestion import ITEMS_ADDONS_COLUMNS, group_items_with_addons, read_items_with_addons
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def format_number(value):
+    if isinstance(value, (int, float)):
+        if float(value).is_integer():
+            return str(int(value))
+        else:
+            return str(value)
+    else:
+        raise ValueError("Input must be an int or float")
+
+
+def make_frame(n):
+    return pd.DataFrame({
+        'category_name': [f"Category {i % 20}" for i in range(n)],
+        'item_name': [f"Item {i // 8}" for i in range(n)],
+        'addon_category': [f"Addon Category {i % 30}" for i in range(n)],
+        'addon_name': [f"Addon {i % 500}" for i in range(n)],
+        'addon_price': [float(i % 7) if i % 3 else (i % 7) + 0.5 for i in range(n)],
+        'category_status': ["Yes" if i % 2 else "No" for i in range(n)],
+    }, columns=ITEMS_ADDONS_COLUMNS)
+
+
+def run_iterrows(df):
+    result = {}
+    for _, row in df.iterrows():
+        item = row['item_name']
+        addon_details = [row['category_name'], row['addon_category'], row['addon_name'], format_number(row['addon_price']), row['category_status']]
+        result.setdefault(item, []).append(addon_details)
+    return result
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    print(f"{'rows':>8} {'iterrows (s)':>13} {'vectorized (s)':>14} {'csv stream (s)':>15}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in SIZES:
+            df = make_frame(size)
+            csv_path = os.path.join(tmp_dir, f"items_addons_{size}.csv")
+            df.to_csv(csv_path, index=False)
+
+            iterrows_time, expected = timed(run_iterrows, df)
+            groupby_time, grouped = timed(group_items_with_addons, df)
+            stream_time, streamed = timed(read_items_with_addons, csv_path, 5_000)
+            assert grouped == expected, "vectorized ingestion changed the item -> addons mapping"
+            assert streamed == expected, "streaming ingestion changed the item -> addons mapping"
+            print(f"{size:>8} {iterrows_time:13.4f} {groupby_time:14.4f} {stream_time:15.4f}")
@@ -0,0 +1,279 @@
+import html
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup_store import DedupStore
+from portal_stub import StubServer
+
+ADDON_THEMES = ["Extra Sauces", "Drinks", "Sides", "Toppings", "Bread Choice", "Cheese", "Spice Level",
+                "Desserts", "Dips", "Size", "Salad Dressing", "Add Protein"]
+ITEM_WORDS = ["Chicken", "Beef", "Falafel", "Halloumi", "Shawarma", "Burger", "Wrap", "Bowl", "Pizza",
+              "Salad", "Fries", "Rice", "Pasta", "Taco", "Curry", "Kebab"]
+PRICES = [0, 1, 1.5, 2, 2.5, 3, 4, 5]
+
+
+def price_text(price):
+    return f"{price:.2f}" if price else "0"
+
+
+def synthetic_menu(item_count, seed=0, items_per_category=12):
+    """A deterministic menu of item_count items sharing a pool of addon categories, like a real storefront."""
+    rng = random.Random(seed)
+    addon_categories = []
+    for index in range(max(4, min(200, item_count // 25))):
+        theme = ADDON_THEMES[index % len(ADDON_THEMES)]
+        name = f"{theme} {index // len(ADDON_THEMES) + 1}"
+        addons = [{'name': f"{theme.split()[-1]} Option {index + 1}-{option + 1}", 'price': rng.choice(PRICES)}
+                  for option in range(rng.randint(2, 8))]
+        addon_categories.append({'name': name, 'required': rng.random() < 0.3,
+                                 'count': rng.randint(1, len(addons)), 'addons': addons})
+
+    categories = []
+    for index in range(item_count):
+        if index % items_per_category == 0:
+            categories.append({'name': f"Menu Section {len(categories) + 1}", 'items': []})
+        word = ITEM_WORDS[index % len(ITEM_WORDS)]
+        categories[-1]['items'].append({
+            'id': str(index + 1),
+            'name': f"{word} Special {index + 1}",
+            'description': f"House {word.lower()} with seasonal garnish",
+            'price': rng.choice(PRICES[3:]) * 10,
+            'addon_categories': rng.sample(range(len(addon_categories)), rng.randint(0, 3)),
+        })
+    return {'categories': categories, 'addon_categories': addon_categories}
+
+
+def menu_items(menu):
+    """(category_name, item, [addon categories]) for every item of the menu."""
+    for category in menu['categories']:
+        for item in category['items']:
+            yield category['name'], item, [menu['addon_categories'][index] for index in item['addon_categories']]
+
+
+def expected_exports(menu, platform="talabat"):
+    """The (addon_cat, addons, items_addons) stores a correct scrape of the menu produces."""
+    cat_rows = DedupStore(['addon_category', 'category_status', 'addon_count_line'])
+    addon_rows = DedupStore(['addon_category', 'addon_name', 'addon_price', 'category_status'])
+    if platform == "talabat":
+        item_rows = DedupStore(['category_name', 'item_name', 'addon_category', 'addon_name', 'addon_price', 'category_status'])
+    else:
+        item_rows = DedupStore(['item_name', 'addon_name', 'addon_price', 'category_status'])
+    for category_name, item, addon_categories in menu_items(menu):
+        for addon_category in addon_categories:
+            status = "Yes" if addon_category['required'] else "No"
+            count = '' if platform == "deliveroo" and addon_category['required'] else str(addon_category['count'])
+            cat_rows.add({'addon_category': addon_category['name'], 'category_status': status, 'addon_count_line': count})
+            for addon in addon_category['addons']:
+                price = price_text(addon['price'])
+                addon_rows.add({'addon_category': addon_category['name'], 'addon_name': addon['name'],
+                                'addon_price': price, 'category_status': status})
+                if platform == "talabat":
+                    item_rows.add({'category_name': category_name, 'item_name': item['name'],
+                                   'addon_category': addon_category['name'], 'addon_name': addon['name'],
+                                   'addon_price': price, 'category_status': status})
+                else:
+                    item_rows.add({'item_name': item['name'], 'addon_name': addon['name'],
+                                   'addon_price': price, 'category_status': status})
+    return cat_rows, addon_rows, item_rows
+
+
+def seed_portal(state, menu, categories=False, addons=False):
+    """Reset the portal stub to the menu's item catalog, optionally with its addon categories and addons already created."""
+    state.reset([{'category': category_name, 'title': item['name'], 'price': str(item['price'])}
+                 for category_name, item, _ in menu_items(menu)])
+    cat_rows, addon_rows, _ = expected_exports(menu)
+    if categories or addons:
+        for row in cat_rows:
+            state.categories.append({'id': len(state.categories) + 1, 'name': row['addon_category'], 'status': "1",
+                                     'is_required': "1" if row['category_status'] == "Yes" else "0",
+                                     'count': row['addon_count_line']})
+    if addons:
+        ids = state.category_options()
+        for row in addon_rows:
+            state.addons.append({'id': len(state.addons) + 1, 'name': row['addon_name'], 'price': row['addon_price'],
+                                 'addon_category_id': ids[row['addon_category']], 'status': "1"})
+
+
+def expected_links(menu):
+    """Item-addon links the linker should make once every addon exists in the portal."""
+    _, _, item_rows = expected_exports(menu)
+    return len(item_rows)
+
+
+TALABAT_SCRIPT = """
+document.addEventListener('click', async (event) => {
+    if (event.target.closest('.close-span')) {
+        document.querySelector('div.modal-content').remove();
+        return;
+    }
+    const card = event.target.closest('[data-item]');
+    if (!card) return;
+    const choices = await (await fetch('/talabat/choices/' + card.dataset.item)).json();
+    const modal = document.createElement('div');
+    modal.className = 'modal-content';
+    modal.innerHTML = '<span class="clickable close-span">x</span>' + choices.result.choiceSections.map((section) =>
+        '<div class="sc-1bf12ad-0 ilBSTs"><strong data-test="sectionName">' + section.nm + '</strong>' +
+        (section.mnq > 0 ? '' : '<div data-testid="choices-checkboxes-component"></div>') +
+        '<span class="dark-gray align-middle">Choose up to ' + section.mxq + '</span>' +
+        section.ich.map((addon) =>
+            '<div class="col-lg-5 col-md-5 col-sm-16 col-16"><label class="control-label"><span></span><span>' +
+            addon.nm + '</span><span class="currency">' + addon.pr + '</span></label></div>').join('') +
+        '</div>').join('');
+    document.body.appendChild(modal);
+});
+"""
+
+DELIVEROO_SCRIPT = """
+document.addEventListener('click', async (event) => {
+    if (event.target.closest('button.ccl-4704108cacc54616')) {
+        document.querySelector('div.ccl-e2683e5cd3d2680f').remove();
+        return;
+    }
+    const card = event.target.closest('[data-item]');
+    if (!card) return;
+    const sections = await (await fetch('/api/choices/' + card.dataset.item)).json();
+    const modal = document.createElement('div');
+    modal.className = 'ccl-e2683e5cd3d2680f';
+    modal.innerHTML = '<button class="ccl-4704108cacc54616 ccl-4f99b5950ce94015">x</button>' + sections.map((section) =>
+        '<div class="MenuItemModifiers-60c359b419ec39f6"><p class="ccl-649204f2a8e630fd ccl-a396bc55704a9c8a ' +
+        'ccl-0956b2f88e605eb8 ccl-ff5caa8a6f2b96d0 ccl-40ad99f7b47f3781">' + section.name + '</p>' +
+        (section.required ? '<p class="ccl-649204f2a8e630fd ccl-6f43f9bb8ff2d712 ccl-08c109442f3e666d ccl-40ad99f7b47f3781">Required</p>' : '') +
+        '<span class="ccl-649204f2a8e630fd ccl-6f43f9bb8ff2d712">Choose up to ' + section.count + '</span>' +
+        section.addons.map((addon) =>
+            '<div class="ccl-a5e1512b87ef2079"><p class="ccl-649204f2a8e630fd ccl-a396bc55704a9c8a ccl-0956b2f88e605eb8 ' +
+            'ccl-40ad99f7b47f3781">' + addon.name + '</p><div class="ccl-a206e125970432e3">' + addon.price + '</div></div>').join('') +
+        '</div>').join('');
+    document.body.appendChild(modal);
+});
+"""
+
+
+class StorefrontRequestHandler(BaseHTTPRequestHandler):
+    """Serves the fixture menu as a Talabat-like (/talabat) or Deliveroo-like (/deliveroo) storefront."""
+    storefront = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type):
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        menu = self.storefront.menu
+        if path.startswith("/api/choices/") or path.startswith("/talabat/choices/"):
+            if self.storefront.latency_ms:
+                time.sleep(self.storefront.latency_ms / 1000)
+            item_id = path.rsplit("/", 1)[1]
+            choices = self.storefront.talabat_choices(item_id) if path.startswith("/talabat/") else self.storefront.choices(item_id)
+            self.send_body(json.dumps(choices), "application/json")
+        elif path == "/talabat":
+            self.send_body(talabat_page(menu), "text/html; charset=utf-8")
+        elif path == "/deliveroo":
+            self.send_body(deliveroo_page(menu), "text/html; charset=utf-8")
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+
+def next_data(state):
+    return f'<script id="__NEXT_DATA__" type="application/json">{html.escape(json.dumps(state), quote=False)}</script>'
+
+
+def talabat_page(menu):
+    """The storefront page. Like Talabat, its state carries the menu sections but not item choices,
+    which the page loads from /talabat/choices/<item id> when an item is opened."""
+    sections = []
+    body = ['<div data-testid="menu-category"><h4 class="f-20 f-500">Most Popular</h4></div>']
+    for category in menu['categories']:
+        cards = "".join(
+            f'<div class="sc-a31f9fb2-0 dyJtfK d-flex justify-content-between py-2 clickable" data-item="{item["id"]}">'
+            f'<div class="f-15">{html.escape(item["name"])}</div><p>{html.escape(item["description"])}</p>'
+            f'<span>{item["price"]}</span></div>'
+            for item in category['items'])
+        body.append(f'<div data-testid="menu-category"><h4 class="f-20 f-500">{html.escape(category["name"])}</h4>{cards}</div>')
+        sections.append({'nm': category['name'], 'itm': [
+            {'id': item['id'], 'nm': item['name'], 'hc': bool(item['addon_categories'])} for item in category['items']]})
+    state = {'props': {'pageProps': {'menuSection': sections}}}
+    return f'<html><body>{"".join(body)}{next_data(state)}<script>{TALABAT_SCRIPT}</script></body></html>'
+
+
+def deliveroo_page(menu):
+    items, categories = [], []
+    groups = [{'id': str(index), 'name': addon_category['name'], 'minSelection': 1 if addon_category['required'] else 0,
+               'maxSelection': addon_category['count'],
+               'modifierOptions': [{'name': addon['name'], 'price': {'formatted': price_text(addon['price'])}}
+                                   for addon in addon_category['addons']]}
+              for index, addon_category in enumerate(menu['addon_categories'])]
+    body = ['<div class="Layout-4549ebf43c78c99a">Header</div>', '<div class="Layout-4549ebf43c78c99a">Offers</div>']
+    for category_index, category in enumerate(menu['categories']):
+        cards = "".join(
+            f'<div class="MenuItemCard-a927b3314fc88b17" data-item="{item["id"]}">'
+            f'<p class="ccl-649204f2a8e630fd ccl-a396bc55704a9c8a ccl-0956b2f88e605eb8 ccl-ff5caa8a6f2b96d0 ccl-40ad99f7b47f3781">'
+            f'{html.escape(item["name"])}</p><p>{html.escape(item["description"])}</p></div>'
+            for item in category['items'])
+        body.append(f'<div class="Layout-4549ebf43c78c99a"><h2>{html.escape(category["name"])}</h2>{cards}</div>')
+        categories.append({'id': str(category_index), 'name': category['name']})
+        items.extend({'id': item['id'], 'name': item['name'], 'categoryId': str(category_index),
+                      'modifierGroupIds': [str(index) for index in item['addon_categories']]} for item in category['items'])
+    state = {'props': {'initialState': {'menuPage': {'menu': {'meta': {
+        'items': items, 'categories': categories, 'modifierGroups': groups}}}}}}
+    return f'<html><body>{"".join(body)}{next_data(state)}<script>{DELIVEROO_SCRIPT}</script></body></html>'
+
+
+class StorefrontStub:
+    """Local storefront serving a synthetic menu, with optional latency on the per-item choices request."""
+
+    def __init__(self, menu=None, latency_ms=0, host="127.0.0.1", port=0):
+        self.menu = menu or synthetic_menu(10)
+        self.latency_ms = latency_ms
+        handler = type("BoundStorefrontRequestHandler", (StorefrontRequestHandler,), {"storefront": self})
+        self.server = StubServer((host, port), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def menu(self):
+        return self._menu
+
+    @menu.setter
+    def menu(self, menu):
+        self._menu = menu
+        self._choices = {item['id']: addon_categories for _, item, addon_categories in menu_items(menu)}
+
+    def choices(self, item_id):
+        return [{'name': addon_category['name'], 'required': addon_category['required'], 'count': addon_category['count'],
+                 'addons': [{'name': addon['name'], 'price': price_text(addon['price'])} for addon in addon_category['addons']]}
+                for addon_category in self._choices.get(item_id, [])]
+
+    def talabat_choices(self, item_id):
+        """An item's choices in the shape Talabat's choices response uses."""
+        return {'result': {'choiceSections': [
+            {'nm': addon_category['name'], 'mnq': 1 if addon_category['required'] else 0, 'mxq': addon_category['count'],
+             'ich': [{'nm': addon['name'], 'pr': price_text(addon['price'])} for addon in addon_category['addons']]}
+            for addon_category in self._choices.get(item_id, [])]}}
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
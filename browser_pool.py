@@ -0,0 +1,112 @@
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from credentials import browser_headless, browser_sandbox
+
+# Playwright adds the background switches to browsers it launches; pages and shards sharing a pooled browser need them
+# too, or the ones not in front get their timers and rendering throttled.
+CHROMIUM_ARGS = ["--remote-debugging-port=0", "--no-first-run", "--no-default-browser-check",
+                 "--disable-background-timer-throttling", "--disable-renderer-backgrounding",
+                 "--disable-backgrounding-occluded-windows"]
+
+
+def launch_browser(playwright, cdp_endpoint=None, headless=browser_headless):
+    """Connect to a pooled browser when cdp_endpoint is given, otherwise launch one. Works with the sync and async APIs."""
+    if cdp_endpoint:
+        return playwright.chromium.connect_over_cdp(cdp_endpoint)
+    return playwright.chromium.launch(headless=headless, chromium_sandbox=browser_sandbox)
+
+
+class PooledBrowser:
+    """One long-lived Chromium process that Playwright clients attach to over CDP."""
+
+    def __init__(self, executable_path, headless=True, startup_timeout=30, sandbox=browser_sandbox):
+        self.user_data_dir = tempfile.mkdtemp(prefix="addons_browser_")
+        args = [executable_path, f"--user-data-dir={self.user_data_dir}", *CHROMIUM_ARGS]
+        if not sandbox:
+            # As with launch(), Chromium refuses to start sandboxed as root, the usual case in containers.
+            args.append("--no-sandbox")
+        if headless:
+            args.append("--headless=new")
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.endpoint = self.read_endpoint(startup_timeout)
+
+    def read_endpoint(self, timeout):
+        """Wait for Chromium to write DevToolsActivePort and return its websocket endpoint."""
+        port_file = os.path.join(self.user_data_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"browser exited with code {self.process.returncode} during startup")
+            if os.path.exists(port_file):
+                with open(port_file) as endpoint_file:
+                    lines = endpoint_file.read().split()
+                if len(lines) == 2:
+                    return f"ws://127.0.0.1:{lines[0]}{lines[1]}"
+            time.sleep(0.1)
+        self.close()
+        raise TimeoutError(f"browser did not open a debugging port within {timeout}s")
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        if self.is_alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+class BrowserPool:
+    """A fixed number of warm Chromium processes leased out one vendor at a time."""
+
+    def __init__(self, size, headless=True):
+        self.size = size
+        self.headless = headless
+        self.executable_path = None
+        self.browsers = []
+        self.idle = queue.Queue()
+
+    def start(self):
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as p:
+            self.executable_path = p.chromium.executable_path
+        for _ in range(self.size):
+            browser = PooledBrowser(self.executable_path, self.headless)
+            self.browsers.append(browser)
+            self.idle.put(browser)
+        print(f"[BrowserPool] started {self.size} browsers")
+        return self
+
+    @contextmanager
+    def lease(self):
+        """Yield the CDP endpoint of an idle browser, replacing it first if its process has died."""
+        browser = self.idle.get()
+        if not browser.is_alive():
+            print("[BrowserPool] browser process died, starting a replacement")
+            self.browsers.remove(browser)
+            browser.close()
+            browser = PooledBrowser(self.executable_path, self.headless)
+            self.browsers.append(browser)
+        try:
+            yield browser.endpoint
+        finally:
+            self.idle.put(browser)
+
+    def close(self):
+        for browser in self.browsers:
+            browser.close()
+        self.browsers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
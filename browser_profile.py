@@ -0,0 +1,172 @@
+import inspect
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from readiness import LatencyHistogram, current_scope
+from credentials import browser_lean, browser_block_types, browser_blocked_domains
+
+TRACKER_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googleadservices.com", "googlesyndication.com",
+    "facebook.net", "facebook.com", "connect.facebook.net", "hotjar.com", "segment.io", "segment.com",
+    "amplitude.com", "mixpanel.com", "braze.com", "appsflyer.com", "adjust.com", "branch.io", "criteo.com",
+    "tiktok.com", "snapchat.com", "clarity.ms", "bing.com", "newrelic.com", "nr-data.net", "sentry.io",
+    "datadoghq.com", "optimizely.com", "onetrust.com", "cookielaw.org", "intercom.io",
+)
+
+
+class NetworkMetrics:
+    """Requests, blocked requests, downloaded bytes and page-load times across every context in the run.
+
+    A context created inside readiness.metrics_scope is also counted under that scope.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_type = {}
+        self.blocked_trackers = 0
+        self.page_loads = LatencyHistogram()
+        self.navigations = {}
+        self.scopes = {}
+
+    def targets(self):
+        """The metrics a context created now records into: the run totals and the current scope's."""
+        scope = current_scope()
+        if scope is None:
+            return [self]
+        with self.lock:
+            return [self, self.scopes.setdefault(scope, NetworkMetrics())]
+
+    def counts(self, resource_type):
+        return self.by_type.setdefault(resource_type, {'requests': 0, 'blocked': 0, 'bytes': 0})
+
+    def attach(self, context, targets=None):
+        for metrics in targets or [self]:
+            context.on("request", metrics.on_request)
+            context.on("requestfinished", metrics.on_request_finished)
+            context.on("page", lambda page, metrics=metrics: page.on("load", metrics.on_load))
+
+    def on_request(self, request):
+        with self.lock:
+            self.counts(request.resource_type)['requests'] += 1
+            if request.is_navigation_request() and request.frame.parent_frame is None:
+                self.navigations[id(request.frame)] = time.perf_counter()
+
+    def on_request_finished(self, request):
+        """Count the bytes a finished request downloaded: response body plus headers, compressed or chunked alike."""
+        try:
+            sizes = request.sizes()
+        except Exception:
+            return
+        if inspect.isawaitable(sizes):
+            return self._on_request_finished_async(request, sizes)
+        self.add_bytes(request, sizes)
+
+    async def _on_request_finished_async(self, request, sizes):
+        try:
+            sizes = await sizes
+        except Exception:
+            return
+        self.add_bytes(request, sizes)
+
+    def add_bytes(self, request, sizes):
+        size = max(sizes.get('responseBodySize', 0), 0) + max(sizes.get('responseHeadersSize', 0), 0)
+        with self.lock:
+            self.counts(request.resource_type)['bytes'] += size
+
+    def on_load(self, page):
+        with self.lock:
+            start = self.navigations.pop(id(page.main_frame), None)
+            if start is not None:
+                self.page_loads.record((time.perf_counter() - start) * 1000)
+
+    def record_blocked(self, request, tracker):
+        with self.lock:
+            self.counts(request.resource_type)['blocked'] += 1
+            self.blocked_trackers += tracker
+
+    def report(self, scope=None):
+        if scope is not None:
+            with self.lock:
+                scoped = self.scopes.get(scope)
+            return (scoped or NetworkMetrics()).report()
+        with self.lock:
+            by_type = {resource_type: dict(counts) for resource_type, counts in sorted(self.by_type.items())}
+            return {
+                'requests': sum(counts['requests'] for counts in by_type.values()),
+                'blocked': sum(counts['blocked'] for counts in by_type.values()),
+                'blocked_trackers': self.blocked_trackers,
+                'bytes': sum(counts['bytes'] for counts in by_type.values()),
+                'page_load': self.page_loads.as_dict(),
+                'by_type': by_type,
+            }
+
+    def print_report(self):
+        report = self.report(current_scope())
+        if not report['requests']:
+            return
+        page_load = report['page_load']
+        print(f"[Network] {report['requests']} requests, {report['blocked']} blocked "
+              f"({report['blocked_trackers']} trackers), {report['bytes'] / 1048576:.1f} MB downloaded; "
+              f"page load p50 {page_load['p50_ms'] or 0:.0f}ms p95 {page_load['p95_ms'] or 0:.0f}ms "
+              f"over {page_load['count']} loads")
+        for resource_type, counts in report['by_type'].items():
+            print(f"  {resource_type:<12} requests={counts['requests']:<6} blocked={counts['blocked']:<6} "
+                  f"kb={counts['bytes'] / 1024:.0f}")
+
+    def save_report(self, path):
+        with open(path, "w", encoding="utf-8") as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+
+class BrowserProfile:
+    """Context options and request routing for the lean profile: no images, media, fonts or tracker scripts."""
+
+    def __init__(self, lean=True, block_types=(), blocked_domains=(), metrics=None):
+        self.lean = lean
+        self.block_types = set(block_types)
+        self.blocked_domains = tuple(blocked_domains)
+        self.metrics = metrics
+
+    def is_tracker(self, url):
+        host = urlparse(url).hostname or ""
+        return any(host == domain or host.endswith(f".{domain}") for domain in self.blocked_domains)
+
+    def handle_route(self, route, metrics=None):
+        """Abort blocked requests and let the rest through; works as a sync or async route handler."""
+        request = route.request
+        tracker = self.is_tracker(request.url)
+        if tracker or request.resource_type in self.block_types:
+            for target in metrics or [self.metrics]:
+                target.record_blocked(request, tracker)
+            return route.abort()
+        return route.continue_()
+
+    def context_options(self, storage_state_path=None, **options):
+        """new_context() options, loading storage_state_path (cookies and local storage) when it exists."""
+        if self.lean:
+            options.setdefault("service_workers", "block")
+        if storage_state_path and os.path.exists(storage_state_path):
+            options.setdefault("storage_state", storage_state_path)
+        return options
+
+    def new_context(self, browser, storage_state_path=None, **options):
+        context = browser.new_context(**self.context_options(storage_state_path, **options))
+        metrics = self.metrics.targets()
+        self.metrics.attach(context, metrics)
+        if self.lean:
+            context.route("**/*", lambda route: self.handle_route(route, metrics))
+        return context
+
+    async def new_context_async(self, browser, storage_state_path=None, **options):
+        context = await browser.new_context(**self.context_options(storage_state_path, **options))
+        metrics = self.metrics.targets()
+        self.metrics.attach(context, metrics)
+        if self.lean:
+            await context.route("**/*", lambda route: self.handle_route(route, metrics))
+        return context
+
+
+network_metrics = NetworkMetrics()
+profile = BrowserProfile(browser_lean, browser_block_types, TRACKER_DOMAINS + tuple(browser_blocked_domains), network_metrics)
@@ -0,0 +1,181 @@
+import asyncio
+import csv
+import math
+import os
+from credentials import email, password, vendor_name, portal_url, bulk_import_path
+from catalog_index import ListingIndex, OptionIndex
+from ingestion import read_items_with_addons
+from instrumentation import instrumentation
+from items_addons_linker import ItemsAddonsLinker
+from portal_http import PortalHttpClient
+from text_normalization import normalize_key
+import addons_categories_creator
+import addons_uploader
+
+IMPORT_COLUMNS = ["record", "category", "required", "count", "addon", "price", "item_category", "item"]
+REQUIRED_LABELS = ("Yes", "No")
+
+
+def format_price(value):
+    """A price as format_number writes it, or None when it is not a finite number."""
+    try:
+        number = float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    return ItemsAddonsLinker.format_number(number) if math.isfinite(number) else None
+
+
+def text(value):
+    return "" if value is None or value != value else str(value).strip()
+
+
+class ImportPlan:
+    """Import rows for categories, addons and item links that passed pre-flight validation.
+
+    Rows that would fail in the portal (a missing name or category, a duplicate, a bad price or count)
+    are kept in ``problems`` instead, and rows the portal already has are counted in ``existing``, so
+    neither costs a round trip. Categories that exist are written with the portal's own spelling.
+    """
+
+    def __init__(self, portal_categories=None, portal_addons=None):
+        self.portal_categories = portal_categories or OptionIndex()
+        self.portal_addons = portal_addons or ListingIndex(columns=addons_uploader.LISTING_COLUMNS)
+        self.rows = []
+        self.problems = []
+        self.existing = 0
+        self.categories = {}
+        self.addons = set()
+        self.links = set()
+
+    def reject(self, record, row, reason):
+        self.problems.append((record, row, reason))
+        instrumentation.count("import_rejected")
+
+    def category_name(self, name):
+        """The category's spelling in the portal or in this file, or None if neither has it."""
+        return self.portal_categories.label(name) or self.categories.get(normalize_key(name))
+
+    def add_category(self, row):
+        """Add an addon_cat row ({'category', 'category_status', 'count'})."""
+        name, required, count = text(row['category']), text(row['category_status']), format_price(row['count'])
+        if not name:
+            return self.reject("category", row, "missing name")
+        if required not in REQUIRED_LABELS:
+            return self.reject("category", row, f"required must be Yes or No, not '{required}'")
+        if required == "No" and (count is None or not count.isdigit()):
+            return self.reject("category", row, f"count '{text(row['count'])}' is not a whole number")
+        if normalize_key(name) in self.categories:
+            return self.reject("category", row, "duplicate category")
+        if self.portal_categories.resolve(name) is not None:
+            self.categories[normalize_key(name)] = self.portal_categories.label(name)
+            self.existing += 1
+            return
+        self.categories[normalize_key(name)] = name
+        self.rows.append({"record": "category", "category": name, "required": required,
+                          "count": count if required == "No" else ""})
+
+    def add_addon(self, row):
+        """Add an addons row ({'addon_category', 'addon_name', 'addon_price'})."""
+        name, price = text(row['addon_name']), format_price(row['addon_price'])
+        category = self.category_name(text(row['addon_category']))
+        if not name:
+            return self.reject("addon", row, "missing name")
+        if category is None:
+            return self.reject("addon", row, f"category '{text(row['addon_category'])}' is neither in the portal nor in the file")
+        if price is None:
+            return self.reject("addon", row, f"price '{text(row['addon_price'])}' is not a number")
+        key = (normalize_key(category), normalize_key(name))
+        if key in self.addons:
+            return self.reject("addon", row, "duplicate addon")
+        self.addons.add(key)
+        if self.portal_addons.contains(category, name):
+            self.existing += 1
+            return
+        self.rows.append({"record": "addon", "category": category, "addon": name, "price": price})
+
+    def add_link(self, item_name, details):
+        """Add one item-addon link from read_items_with_addons ([category_name, addon_category, addon_name, price, status])."""
+        item_category, addon_category, addon_name, price = (text(value) for value in details[:4])
+        row = {'item_name': item_name, 'details': details}
+        if not item_name or not item_category:
+            return self.reject("link", row, "missing item or item category")
+        category = self.category_name(addon_category)
+        key = (normalize_key(category or addon_category), normalize_key(addon_name))
+        if key not in self.addons and not self.portal_addons.contains(addon_category, addon_name):
+            return self.reject("link", row, f"addon '{addon_category} / {addon_name}' is neither in the portal nor in the file")
+        link_key = (normalize_key(item_category), normalize_key(item_name)) + key
+        if link_key in self.links:
+            return self.reject("link", row, "duplicate link")
+        self.links.add(link_key)
+        self.rows.append({"record": "link", "category": category or addon_category, "addon": addon_name,
+                          "price": format_price(price) or price, "item_category": item_category, "item": item_name})
+
+    def write(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as import_file:
+            writer = csv.DictWriter(import_file, fieldnames=IMPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.rows)
+        return path
+
+    def print_problems(self, limit=20):
+        if self.existing:
+            print(f"[Import] {self.existing} categories and addons are already in the portal")
+        if not self.problems:
+            return
+        print(f"[Import] {len(self.problems)} rows failed pre-flight validation and were left out:")
+        for record, row, reason in self.problems[:limit]:
+            print(f"  [{record}] {reason}: {row}")
+        if len(self.problems) > limit:
+            print(f"  ... and {len(self.problems) - limit} more")
+
+
+def build_plan(categories, addons, items_data, portal_categories=None, portal_addons=None):
+    """Validate the three exports, in dependency order, into one ImportPlan."""
+    plan = ImportPlan(portal_categories, portal_addons)
+    for row in categories:
+        plan.add_category(row)
+    for row in addons:
+        plan.add_addon(row)
+    for item_name, addon_details in items_data.items():
+        for details in addon_details:
+            plan.add_link(item_name, details)
+    return plan
+
+
+async def run_import(username, password, base_path, import_path=bulk_import_path, base_url=portal_url):
+    """Validate the scraped exports in base_path and send them to the portal's import page in one request.
+
+    Returns the portal's summary with the number of rows pre-flight validation left out under
+    'rejected', or None when the portal has no import page, so the caller can fall back to the
+    category creator, uploader and linker.
+    """
+    categories = addons_categories_creator.read_excel_to_dict_list(os.path.join(base_path, "addon_cat.xlsx"))
+    addons = addons_uploader.read_excel_to_dict_list(os.path.join(base_path, "addons.xlsx"))
+    items_data = read_items_with_addons(os.path.join(base_path, "items_addons.xlsx"))
+    async with PortalHttpClient(base_url) as client:
+        await client.login(username, password)
+        portal_categories = (await client.get_form("/addons/create")).get("addon_category_id")
+        portal_addons = ListingIndex(await client.listing_rows("/addons"), addons_uploader.LISTING_COLUMNS)
+        with instrumentation.span("import_preflight"):
+            plan = build_plan(categories, addons, items_data, portal_categories, portal_addons)
+        plan.print_problems()
+        if not plan.rows:
+            print("[Import] nothing new to import")
+            return {'created': {}, 'errors': [], 'rejected': len(plan.problems)}
+        file_path = plan.write(os.path.join(base_path, "portal_import.csv"))
+        with instrumentation.span("import_upload"):
+            summary = await client.import_file(import_path, file_path)
+    if summary is None:
+        print(f"[Import] the portal has no import page at {import_path}")
+        return None
+    print(f"[Import] created {summary.get('created')}")
+    for error in summary.get('errors', []):
+        print(f"  line {error.get('line')}: {error.get('error')}")
+    instrumentation.count("import_rows", len(plan.rows))
+    return dict(summary, rejected=len(plan.problems))
+
+
+if __name__ == "__main__":
+    base_path = os.path.join(os.path.expanduser("~"), "Desktop", vendor_name, "addons")
+    asyncio.run(run_import(email, password, base_path))
+    instrumentation.finish()
@@ -0,0 +1,155 @@
+import json
+import os
+import time
+from readiness import readiness
+from instrumentation import instrumentation
+from text_normalization import normalize_key
+
+ROW_CELLS_SCRIPT = "rows => rows.map(row => Array.from(row.querySelectorAll('td')).map(cell => cell.textContent.trim()))"
+OPTIONS_SCRIPT = "options => options.map(option => [option.textContent.trim(), option.value])"
+
+
+class CatalogIndex:
+    """Vendor item catalog keyed on a normalized (title, category) pair, cached in memory and on disk."""
+
+    def __init__(self, cache_path, key_func, ttl=3600):
+        self.cache_path = cache_path
+        self.key_func = key_func
+        self.ttl = ttl
+        self.items = {}
+        self.crawled_at = None
+
+    def key(self, title, category):
+        return f"{self.key_func(title)}|{self.key_func(category)}"
+
+    def is_fresh(self):
+        return self.crawled_at is not None and time.time() - self.crawled_at < self.ttl
+
+    def load(self):
+        """Load the on-disk index; return True if it exists and is still within the TTL."""
+        if not os.path.exists(self.cache_path):
+            return False
+        with open(self.cache_path, encoding="utf-8") as cache_file:
+            cached = json.load(cache_file)
+        self.items, self.crawled_at = cached["items"], cached["crawled_at"]
+        return self.is_fresh()
+
+    def save(self):
+        with open(self.cache_path, "w", encoding="utf-8") as cache_file:
+            json.dump({"crawled_at": self.crawled_at, "items": self.items}, cache_file)
+
+    def add(self, item_link):
+        key = self.key(item_link["title"], item_link["category"])
+        if key in self.items:
+            print(f"[Catalog] duplicate item '{item_link['title']}' in '{item_link['category']}', keeping first")
+            return
+        self.items[key] = item_link["link"]
+
+    def crawl(self, page, list_url, table_selector, extract_rows, wait=None):
+        """Walk list_url?page=N until a page adds no new rows, indexing every item on the way."""
+        self.items = {}
+        seen_links = set()
+        page_number = 1
+        while True:
+            instrumentation.goto(page, f"{list_url}?page={page_number}", name="goto_listing")
+            if wait:
+                wait(page)
+            table = page.query_selector(table_selector)
+            rows = extract_rows(table) if table else []
+            new_rows = [row for row in rows if row["link"] not in seen_links]
+            if not new_rows:
+                break
+            for row in new_rows:
+                seen_links.add(row["link"])
+                self.add(row)
+            page_number += 1
+        self.crawled_at = time.time()
+        self.save()
+        print(f"[Catalog] indexed {len(self.items)} items from {page_number - 1} pages")
+
+    def ensure(self, page, list_url, table_selector, extract_rows, wait=None, refresh=False):
+        """Use the cached index when it is fresh, otherwise crawl the listing again."""
+        if refresh or not (self.is_fresh() or self.load()):
+            self.crawl(page, list_url, table_selector, extract_rows, wait)
+
+    def lookup(self, title, category):
+        return self.items.get(self.key(title, category))
+
+
+class ListingIndex:
+    """Rows of a portal listing table, keyed on the cells in columns, so a spreadsheet row can be checked
+    against existing entities.
+
+    columns are the listing's column positions for the values contains() is called with, in that order,
+    so a name is only ever compared with the name column and never with a status or price.
+    """
+
+    def __init__(self, rows=(), columns=(0,)):
+        self.columns = tuple(columns)
+        self.keys = set()
+        for cells in rows:
+            if len(cells) > max(self.columns):
+                self.add(*(cells[column] for column in self.columns))
+
+    @staticmethod
+    def key(values):
+        return tuple(normalize_key(value) for value in values)
+
+    def add(self, *values):
+        """Record an entity by the values contains() looks it up with, such as one created during this run."""
+        self.keys.add(self.key(values))
+
+    def contains(self, *values):
+        """True if a listing row has these values in its key columns (compared without case or spacing)."""
+        return self.key(values) in self.keys
+
+
+class OptionIndex:
+    """A form select's options as normalized label -> value, so a spreadsheet label can be selected by value."""
+
+    def __init__(self, options=()):
+        self.values = {}
+        self.labels = {}
+        for label, value in options:
+            self.add(label, value)
+
+    def add(self, label, value):
+        if label and value:
+            self.values.setdefault(normalize_key(label), value)
+            self.labels.setdefault(normalize_key(label), label)
+
+    def resolve(self, label):
+        """Option value for a label compared without case or spacing, or None if the select has no such option."""
+        return self.values.get(normalize_key(label))
+
+    def label(self, label):
+        """The select's own spelling of a label, or None if it has no such option."""
+        return self.labels.get(normalize_key(label))
+
+    def unresolved(self, labels):
+        return sorted({label for label in labels if self.resolve(label) is None})
+
+
+async def read_options_async(page, select_selector):
+    """Read a select's options once, instead of matching the label on every form load."""
+    return OptionIndex(await page.eval_on_selector_all(f"{select_selector} option", OPTIONS_SCRIPT))
+
+
+async def crawl_listing_async(page, list_url, table_selector="table.w-full.whitespace-nowrap"):
+    """Read every page of a portal listing table and return the cell texts of each row."""
+    rows, seen, page_number = [], set(), 1
+    while True:
+        await instrumentation.goto(page, f"{list_url}?page={page_number}", name="goto_listing")
+        try:
+            await readiness.wait_for_selector(page, table_selector, name="listing_page", state="attached")
+        except Exception:
+            break
+        new_rows = [cells for cells in await page.eval_on_selector_all(f"{table_selector} tr", ROW_CELLS_SCRIPT)
+                    if cells and tuple(cells) not in seen]
+        if not new_rows:
+            break
+        for cells in new_rows:
+            seen.add(tuple(cells))
+        rows.extend(new_rows)
+        page_number += 1
+    return rows
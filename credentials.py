@@ -1,4 +1,29 @@
 email = ''
 password = ''
 vendor_name = ''
-vendor_url = ''
\ No newline at end of file
+vendor_url = ''
+portal_url = 'https://vendor.elitewherego.com'
+scraper_workers = 1
+scraper_engine = 'dom'
+scraper_incremental = False
+scraper_flush_rows = 0
+linker_workers = 1
+linker_catalog_index = False
+linker_catalog_ttl = 3600
+upload_backend = 'browser'
+upload_concurrency = 4
+upload_create_categories = True
+journal_run_id = ''
+bulk_import_path = '/import'
+batch_browsers = 2
+pipeline_stream = False
+pipeline_excel = True
+retry_attempts = 3
+retry_base_delay = 0.5
+browser_headless = True
+browser_sandbox = False
+browser_lean = True
+browser_block_types = ['image', 'media', 'font']
+browser_blocked_domains = []
+instrumentation_report = ''
+instrumentation_trace = ''
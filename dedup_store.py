@@ -0,0 +1,53 @@
+class DedupStore:
+    """Insertion-ordered collection of rows, deduplicated on a tuple of key fields.
+
+    With a record_type from records.py, rows are stored as that compact record (dicts are converted
+    on add), and a key made of every field is the record itself. drain() hands back the rows added
+    since the last drain and keeps only the hashes of their keys, so a store that is flushed to disk
+    as it goes stays small however large the menu.
+    """
+
+    def __init__(self, keys, record_type=None):
+        self.keys = tuple(keys)
+        self.record_type = record_type
+        self._whole_record = record_type is not None and self.keys == tuple(record_type._fields)
+        self._records = {}
+        self._drained = set()
+
+    def _record(self, data):
+        if self.record_type is None or isinstance(data, self.record_type):
+            return data
+        return self.record_type.from_row(data)
+
+    def _key(self, data):
+        if self._whole_record:
+            return data
+        return tuple(data.get(key) for key in self.keys)
+
+    def add(self, data):
+        """Add data unless a record with the same key fields exists. Return True if it was added."""
+        data = self._record(data)
+        key = self._key(data)
+        if self._seen(key):
+            return False
+        self._records[key] = data
+        return True
+
+    def _seen(self, key):
+        return key in self._records or (bool(self._drained) and hash(key) in self._drained)
+
+    def __contains__(self, data):
+        return self._seen(self._key(self._record(data)))
+
+    def drain(self):
+        """Return the rows added since the last drain and forget them, apart from their keys."""
+        rows = list(self._records.values())
+        self._drained.update(hash(key) for key in self._records)
+        self._records = {}
+        return rows
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    def __len__(self):
+        return len(self._records)
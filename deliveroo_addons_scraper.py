@@ -1,137 +1,198 @@
 from playwright.sync_api import sync_playwright
 import re
-import openpyxl
-from openpyxl.styles import Font
-from credentials import vendor_name, vendor_url
+from credentials import vendor_name, vendor_url, scraper_engine, scraper_incremental, scraper_flush_rows
 import os
-
-class DeliverooAddonScraper:
-    def __init__(self, url, base_path, browser_context):
+from dedup_store import DedupStore
+from records import CategoryRow, AddonRow, DeliverooItemAddonRow
+from modal_extraction import read_modal
+from readiness import readiness
+from browser_pool import launch_browser
+from browser_profile import profile
+from instrumentation import instrumentation
+from menu_capture import MenuResponseCapture, DELIVEROO_URL_PATTERN, deliveroo_menu_items
+from menu_snapshot import MenuSnapshot, CARD_TEXT_SCRIPT
+from scraped_rows import ScrapedRows
+
+class DeliverooAddonScraper(ScrapedRows):
+    MODAL_SPEC = {
+        'window': 'div.ccl-e2683e5cd3d2680f',
+        'category': "div.MenuItemModifiers-60c359b419ec39f6",
+        'name': "p.ccl-649204f2a8e630fd.ccl-a396bc55704a9c8a.ccl-0956b2f88e605eb8.ccl-ff5caa8a6f2b96d0.ccl-40ad99f7b47f3781",
+        'marker': "p.ccl-649204f2a8e630fd.ccl-6f43f9bb8ff2d712.ccl-08c109442f3e666d.ccl-40ad99f7b47f3781",
+        'count': "span.ccl-649204f2a8e630fd.ccl-6f43f9bb8ff2d712",
+        'count_fallback': 'div.col-lg-5.col-md-5.col-sm-16.col-16',
+        'addon': 'div.ccl-a5e1512b87ef2079',
+        'addon_name': ['p.ccl-649204f2a8e630fd.ccl-a396bc55704a9c8a.ccl-0956b2f88e605eb8.ccl-40ad99f7b47f3781'],
+        'addon_price': ['div.ccl-a206e125970432e3'],
+    }
+    MODAL_CLOSE_SELECTOR = "div.ccl-e2683e5cd3d2680f button.ccl-4704108cacc54616.ccl-4f99b5950ce94015"
+    CATEGORY_SELECTOR = "div.Layout-4549ebf43c78c99a"
+    SECTION_HEADING_SELECTOR = "h2"
+    GEOLOCATION = {"latitude": 25.186054760669197, "longitude": 55.27504936531868, "accuracy": 100}
+
+    def __init__(self, url, base_path, browser_context, engine='dom', snapshot_path=None, on_records=None, export_excel=True,
+                 flush_rows=0):
         self.url = url
         self.base_path = base_path
         self.browser_context = browser_context
-        self.cat_attributes = []
-        self.addon_attributes = []
-        self.items_addons_attributes = []
-
-    def append_to_excel(self, filename, data):
-        """Append data to an Excel file, creating headers if file does not exist."""
-        excel_path = f"{self.base_path}\\{filename}"
-        try:
-            workbook = openpyxl.load_workbook(excel_path)
-            sheet = workbook.active
-        except FileNotFoundError:
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            bold_font = Font(bold=True)
-            sheet.append(list(data.keys()))
-            for cell in sheet[1]:
-                cell.font = bold_font
-
-        sheet.append(list(data.values()))
-        workbook.save(excel_path)
-        
+        self.engine = engine
+        self.cat_attributes = DedupStore(['addon_category', 'category_status', 'addon_count_line'], CategoryRow)
+        self.addon_attributes = DedupStore(['addon_category', 'addon_name', 'addon_price', 'category_status'], AddonRow)
+        self.items_addons_attributes = DedupStore(['item_name', 'addon_name', 'addon_price', 'category_status'], DeliverooItemAddonRow)
+        self.snapshot = MenuSnapshot(snapshot_path) if snapshot_path and engine != 'network' else None
+        self.on_records = on_records
+        self.export_excel = export_excel
+        self.flush_rows = flush_rows
+        self.items_done = 0
+        self.items_failed = 0
+        self.spills = {}
+
     def capitalize_sentence(self, sentence):
         return ' '.join(word.capitalize() for word in sentence.split())
 
 
-    def dict_exists(self, target_dict, data_list, keys):
-        """Check if a dictionary with specific keys exists in a list."""
-        return any(all(d.get(key) == target_dict.get(key) for key in keys) for d in data_list)
-
     def extract_addon_details(self, addon):
-        """Extract addon name and price from a given addon element."""
-        addon_name = addon.query_selector('p.ccl-649204f2a8e630fd.ccl-a396bc55704a9c8a.ccl-0956b2f88e605eb8.ccl-40ad99f7b47f3781').text_content()
-        try:                                
-            addon_price  = addon.query_selector('div.ccl-a206e125970432e3').text_content()
-        except:
-            addon_price = ''
+        """Extract addon name and price from an addon read out of the modal."""
+        if addon['name'] is None:
+            raise ValueError("addon name not found")
+        addon_name = addon['name']
+        addon_price = addon['price'] if addon['price'] is not None else ''
         return addon_name, addon_price
 
-    def extract_addon_categories(self, page, category, selector):
+    def modal_rows(self, item_name, modal):
+        """Build (category, addon, item-addon) rows from a modal read with read_modal."""
+        if modal is None:
+            raise ValueError(f"addon modal did not open for '{item_name}'")
+        cat_rows, addon_rows, item_rows = [], [], []
+        for addon_category in modal:
+            is_required = addon_category['marked']
+            category_status = "No" if not is_required else "Yes"
+            
+            addon_category_name = self.capitalize_sentence(addon_category['name'].strip())
+            if not is_required:    
+                count_text = addon_category['count_text'] or ''
+                addon_count = re.search(r'\d+', count_text).group() if re.search(r'\d+', count_text) else \
+                              addon_category['fallback_count']
+            else:
+                addon_count = ''
+
+            cat_rows.append(CategoryRow.make(addon_category_name, category_status, addon_count))
+
+            for addon in addon_category['addons']:
+                addon_name, addon_price = self.extract_addon_details(addon)
+                
+                item_rows.append(DeliverooItemAddonRow.make(item_name, addon_name, addon_price, category_status))
+                addon_rows.append(AddonRow.make(addon_category_name, addon_name, addon_price, category_status))
+        return cat_rows, addon_rows, item_rows
+
+    def section_name(self, category, index):
+        """The menu section's heading, or its position when it has none, to key snapshot items by section."""
+        heading = category.eval_on_selector_all(self.SECTION_HEADING_SELECTOR, "els => els.length ? els[0].textContent.trim() : ''")
+        return heading or f"Section {index}"
+
+    def extract_addon_categories(self, page, category, selector, section_name=""):
         """Extract all addon categories and their items from the menu."""
-        for item in category.query_selector_all(selector):
+        items = category.query_selector_all(selector)
+        card_texts = category.eval_on_selector_all(selector, CARD_TEXT_SCRIPT) if self.snapshot else [None] * len(items)
+        for item, card_text in zip(items, card_texts):
             try:
-                item_name = item.query_selector('p.ccl-649204f2a8e630fd.ccl-a396bc55704a9c8a.ccl-0956b2f88e605eb8.ccl-ff5caa8a6f2b96d0.ccl-40ad99f7b47f3781').text_content().strip()
-                item.click()
-                page.wait_for_timeout(2000)
-
-                addon_window = page.query_selector('div.ccl-e2683e5cd3d2680f')
-                addon_categories = addon_window.query_selector_all("div.MenuItemModifiers-60c359b419ec39f6")
-
-                for addon_category in addon_categories:
-                    is_required = addon_category.query_selector("p.ccl-649204f2a8e630fd.ccl-6f43f9bb8ff2d712.ccl-08c109442f3e666d.ccl-40ad99f7b47f3781")
-                    category_status = "No" if not is_required else "Yes"
-                    
-                    addon_category_name = self.capitalize_sentence(addon_category.query_selector("p.ccl-649204f2a8e630fd.ccl-a396bc55704a9c8a.ccl-0956b2f88e605eb8.ccl-ff5caa8a6f2b96d0.ccl-40ad99f7b47f3781").text_content().strip())
-                    if not is_required:    
-                        count_text = addon_category.query_selector("span.ccl-649204f2a8e630fd.ccl-6f43f9bb8ff2d712").text_content()
-                        addon_count = re.search(r'\d+', count_text).group() if re.search(r'\d+', count_text) else \
-                                      len(addon_category.query_selector_all('div.col-lg-5.col-md-5.col-sm-16.col-16'))
-                    else:
-                        addon_count = ''
-
-                    cat_data = {'addon_category': addon_category_name, 'category_status': category_status, 'addon_count_line': addon_count}
-                    if not self.dict_exists(cat_data, self.cat_attributes, cat_data.keys()):
-                        self.cat_attributes.append(cat_data)
-
-                    for addon in addon_category.query_selector_all('div.ccl-a5e1512b87ef2079'):
-                        addon_name, addon_price = self.extract_addon_details(addon)
-                        
-                        item_data = {'item_name': item_name, 'addon_name': addon_name, 'addon_price': addon_price, 'category_status': category_status,}
-                        if not self.dict_exists(item_data, self.items_addons_attributes, item_data.keys()):
-                            self.items_addons_attributes.append(item_data)
-
-                        addon_data = {'addon_category': addon_category_name, 'addon_name': addon_name, 'addon_price': addon_price, 'category_status': category_status}
-                        if not self.dict_exists(addon_data, self.addon_attributes, addon_data.keys()):
-                            self.addon_attributes.append(addon_data)
-
-                addon_window.query_selector("button.ccl-4704108cacc54616.ccl-4f99b5950ce94015").click()
+                item_key, records = self.previous_records(section_name, card_text)
+                if records is None:
+                    item_name = item.query_selector('p.ccl-649204f2a8e630fd.ccl-a396bc55704a9c8a.ccl-0956b2f88e605eb8.ccl-ff5caa8a6f2b96d0.ccl-40ad99f7b47f3781').text_content().strip()
+                    with instrumentation.span("modal_open"):
+                        item.click()
+                        readiness.wait_for_selector(page, self.MODAL_SPEC['window'], name="modal_open")
+                        readiness.wait_for_settled(page, self.MODAL_SPEC['window'], name="modal_content")
+
+                    with instrumentation.span("modal_read"):
+                        modal = read_modal(page, self.MODAL_SPEC)
+                        records = self.modal_rows(item_name, modal)
+
+                    with instrumentation.span("modal_close"):
+                        page.click(self.MODAL_CLOSE_SELECTOR)
+                        readiness.wait_for_selector(page, self.MODAL_SPEC['window'], name="modal_close", state="hidden")
+                    instrumentation.count("items_scraped")
+                else:
+                    instrumentation.count("items_reused")
+                self.merge_records(records)
+                self.keep_records(item_key, records, section_name)
+                self.items_done += 1
             except Exception as e:
-                print(f"Error processing item: {e}")
+                self.item_failed(e, section_name)
+        for item in items:
+            item.dispose()
 
     def scrape(self):
         """Scrape the menu from the given URL."""
         # with sync_playwright() as p:
         page = self.browser_context.new_page()
-        page.goto(self.url)
-        categories = page.query_selector_all("div.Layout-4549ebf43c78c99a")[2:]
-        for category in categories:
+        instrumentation.goto(page, self.url)
+        readiness.wait_for_selector(page, self.CATEGORY_SELECTOR, name="menu_ready", state="attached")
+        # One category handle at a time (the first two sections are not menu categories), disposed once read.
+        category_count = page.eval_on_selector_all(self.CATEGORY_SELECTOR, "els => els.length")
+        for index in range(2, category_count):
+            category = page.query_selector(f"{self.CATEGORY_SELECTOR} >> nth={index}")
+            if category is None:
+                print(f"Error processing category {index}: not rendered")
+                continue
+            section_name = self.section_name(category, index) if self.snapshot else ""
             self.extract_addon_categories(page, category, 
-                                          "div.MenuItemCard-a927b3314fc88b17")
+                                          "div.MenuItemCard-a927b3314fc88b17", section_name)
+            category.dispose()
   
 
-    def save_to_excel(self):
-        """Save scraped data to Excel files."""
-        for data, filename in zip([self.cat_attributes, self.addon_attributes, self.items_addons_attributes],
-                                  ["addon_cat.xlsx", "addons.xlsx", "items_addons.xlsx"]):
-            for row in data:
-                self.append_to_excel(filename, row)
-
-    def start(self):
-        """Start the scraping process."""
-        self.scrape()
-        self.save_to_excel()
-        print("Scraping and saving complete!")
-
-
-
-with sync_playwright() as p:
-    browser = p.chromium.launch(headless=False)
-    context = browser.new_context()
-    page = browser.new_page( geolocation={"latitude": 25.186054760669197, "longitude": 55.27504936531868, "accuracy": 100}, permissions=["geolocation"])
-    page.goto(vendor_url)
-    page.wait_for_timeout(30000)
-
-    desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
-    desktop_path = desktop_path.replace("\\", "\\\\")
-
-    scraper = DeliverooAddonScraper(
-        url=vendor_url,
-        base_path=f"{desktop_path}",
-        browser_context=context
-    )
-    scraper.start()
-    browser.close()    
+    def add_menu_items(self, menu_items):
+        """Add rows for menu items mapped from captured network payloads."""
+        for menu_item in menu_items:
+            self.items_done += 1
+            cat_rows, addon_rows, item_rows = [], [], []
+            for addon_category in menu_item['addon_categories']:
+                category_status = "Yes" if addon_category['required'] else "No"
+                addon_category_name = self.capitalize_sentence(addon_category['name'].strip())
+                addon_count = '' if addon_category['required'] else str(addon_category['count'])
+                cat_rows.append(CategoryRow.make(addon_category_name, category_status, addon_count))
+
+                for addon in addon_category['addons']:
+                    item_rows.append(DeliverooItemAddonRow.make(menu_item['item_name'], addon['name'], addon['price'], category_status))
+                    addon_rows.append(AddonRow.make(addon_category_name, addon['name'], addon['price'], category_status))
+            self.merge_records((cat_rows, addon_rows, item_rows))
+
+    def scrape_from_network(self):
+        """Scrape the menu from the JSON payloads the page loads, without opening item modals."""
+        capture = MenuResponseCapture(DELIVEROO_URL_PATTERN)
+        page = self.browser_context.new_page()
+        capture.attach(page)
+        instrumentation.goto(page, self.url, wait_until="networkidle")
+        capture.add_html(page.content())
+        page.close()
+        self.add_menu_items(deliveroo_menu_items(capture.payloads))
+
+    def run_engine(self):
+        if self.engine == 'network':
+            self.scrape_from_network()
+        else:
+            self.scrape()
+
+
+if __name__ == "__main__":
+    with sync_playwright() as p:
+        browser = launch_browser(p)
+        context = profile.new_context(browser, geolocation=DeliverooAddonScraper.GEOLOCATION, permissions=["geolocation"])
+        page = context.new_page()
+        instrumentation.goto(page, vendor_url)
+        readiness.wait_for_selector(page, DeliverooAddonScraper.CATEGORY_SELECTOR, name="menu_ready", state="attached")
+
+        desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
+
+        scraper = DeliverooAddonScraper(
+            url=vendor_url,
+            base_path=desktop_path,
+            browser_context=context,
+            engine=scraper_engine,
+            snapshot_path=os.path.join(desktop_path, f"{vendor_name}_menu_snapshot.json") if scraper_incremental else None,
+            flush_rows=scraper_flush_rows
+        )
+        scraper.start()
+        browser.close()    
 
 
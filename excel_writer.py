@@ -0,0 +1,92 @@
+import json
+import os
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from instrumentation import instrumentation
+
+
+def _header_row(sheet, header):
+    bold_font = Font(bold=True)
+    cells = []
+    for value in header:
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.font = bold_font
+        cells.append(cell)
+    return cells
+
+
+def append_rows_to_excel(excel_path, rows):
+    """Append rows (dicts) to an Excel file in one streaming pass, creating a bold header if the file does not exist."""
+    with instrumentation.span("excel_write", path=excel_path):
+        written = _append_rows(excel_path, rows)
+    instrumentation.count("excel_rows", written)
+
+
+class ExcelSpill:
+    """Rows bound for one Excel file, appended to a JSON-lines spill file and written to the workbook once.
+
+    Appending a flush to the workbook itself rewrites every row already in it, so a run that flushes
+    often would cost time quadratic in its rows; save() streams the spill into the workbook in one pass.
+    A spill left behind by an interrupted run is discarded, as its rows are scraped again.
+    """
+
+    def __init__(self, excel_path):
+        self.excel_path = excel_path
+        self.spill_path = f"{excel_path}.spill.jsonl"
+        if os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+    def append(self, rows):
+        with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+            for row in rows:
+                spill_file.write(json.dumps(dict(row.items())) + "\n")
+
+    def _spilled_rows(self):
+        with open(self.spill_path, encoding="utf-8") as spill_file:
+            for line in spill_file:
+                yield json.loads(line)
+
+    def save(self):
+        """Append the spilled rows to the Excel file and remove the spill."""
+        if not os.path.exists(self.spill_path):
+            return
+        append_rows_to_excel(self.excel_path, self._spilled_rows())
+        os.remove(self.spill_path)
+
+
+def _append_rows(excel_path, rows):
+    rows = iter(rows)
+    first_row = next(rows, None)
+    if first_row is None:
+        return 0
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+
+    source = None
+    if os.path.exists(excel_path):
+        source = openpyxl.load_workbook(excel_path, read_only=True)
+        existing_rows = source.active.iter_rows(values_only=True)
+        header = next(existing_rows, None)
+    else:
+        existing_rows = iter(())
+        header = None
+
+    sheet.append(_header_row(sheet, header or list(first_row.keys())))
+    for values in existing_rows:
+        sheet.append(list(values))
+    sheet.append(list(first_row.values()))
+    written = 1
+    for row in rows:
+        sheet.append(list(row.values()))
+        written += 1
+
+    tmp_path = f"{excel_path}.tmp"
+    try:
+        workbook.save(tmp_path)
+    finally:
+        if source is not None:
+            source.close()
+    os.replace(tmp_path, excel_path)
+    return written
@@ -0,0 +1,113 @@
+import os
+import numpy as np
+import pandas as pd
+
+ITEMS_ADDONS_COLUMNS = ['category_name', 'item_name', 'addon_category', 'addon_name', 'addon_price', 'category_status']
+ITEM_ADDON_FIELDS = ['category_name', 'addon_category', 'addon_name', 'addon_price', 'category_status']
+
+
+def _extension(path):
+    return os.path.splitext(path)[1].lower()
+
+
+def _require_pyarrow(path):
+    """Parquet input is optional: it needs pyarrow, which the scripts do not otherwise use."""
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(f"Reading {path} needs pyarrow (pip install pyarrow)") from None
+    return pyarrow.parquet
+
+
+def read_table(path, usecols, names):
+    """Read the given column positions of an xlsx, xls, csv or parquet file, naming them names (first row is the header).
+
+    .xls needs xlrd and .parquet needs pyarrow installed.
+    """
+    extension = _extension(path)
+    if extension in (".xlsx", ".xlsm", ".xls"):
+        return pd.read_excel(path, usecols=usecols, names=names, header=0)
+    if extension == ".csv":
+        return pd.read_csv(path, usecols=usecols, names=names, header=0)
+    if extension == ".parquet":
+        _require_pyarrow(path)
+        df = pd.read_parquet(path)
+        return df.iloc[:, usecols].set_axis(names, axis=1)
+    raise ValueError(f"Unsupported input file type: {path}")
+
+
+def iter_table_chunks(path, usecols, names, chunk_size=10000):
+    """Yield the file as DataFrames of at most chunk_size rows, so memory stays bounded on very large inputs."""
+    extension = _extension(path)
+    if extension == ".csv":
+        yield from pd.read_csv(path, usecols=usecols, names=names, header=0, chunksize=chunk_size)
+    elif extension == ".parquet":
+        pq = _require_pyarrow(path)
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas().iloc[:, usecols].set_axis(names, axis=1)
+    elif extension in (".xlsx", ".xlsm"):
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        try:
+            rows = workbook.active.iter_rows(min_row=2, values_only=True)
+            chunk = []
+            for row in rows:
+                chunk.append([row[index] if index < len(row) else None for index in usecols])
+                if len(chunk) == chunk_size:
+                    yield pd.DataFrame(chunk, columns=names)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=names)
+        finally:
+            workbook.close()
+    elif extension == ".xls":
+        # openpyxl cannot read the old format, but an .xls sheet holds at most 65,536 rows, so reading it
+        # whole is bounded too; it is still handed on in chunks like the other formats.
+        df = read_table(path, usecols, names)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        yield read_table(path, usecols, names)
+
+
+def read_records(path, usecols, names):
+    """Read a spreadsheet (xlsx, csv or parquet) into a list of dicts keyed by names."""
+    return read_table(path, usecols, names).to_dict(orient='records')
+
+
+def format_numbers(values):
+    """Vectorized format_number: whole numbers lose their trailing .0, other numbers keep str(float) form.
+
+    Whole numbers too large for int64 are formatted one by one, as format_number does, instead of overflowing.
+    """
+    numbers = pd.to_numeric(values)
+    formatted = numbers.astype(str)
+    whole = pd.Series(np.isfinite(numbers.astype(float)), index=numbers.index) & (numbers == numbers.round())
+    fits = whole & (numbers.abs() < 2 ** 63)
+    formatted[fits] = numbers[fits].astype('int64').astype(str)
+    formatted[whole & ~fits] = [str(int(value)) for value in numbers[whole & ~fits]]
+    return formatted
+
+
+def group_items_with_addons(df, result=None):
+    """Group item-addon rows into {item_name: [[category_name, addon_category, addon_name, price, status], ...]}.
+
+    Items keep the order they first appear in and each item's addons keep row order. Pass result to
+    keep adding chunks to the same mapping.
+    """
+    result = {} if result is None else result
+    df = df.assign(addon_price=format_numbers(df['addon_price']))
+    for item, addon_details in zip(df['item_name'].tolist(), df[ITEM_ADDON_FIELDS].values.tolist()):
+        result.setdefault(item, []).append(addon_details)
+    return result
+
+
+def read_items_with_addons(path, chunk_size=None):
+    """Build the item -> addons mapping from an items_addons file, streaming it in chunks when chunk_size is set."""
+    usecols = list(range(len(ITEMS_ADDONS_COLUMNS)))
+    if chunk_size is None:
+        return group_items_with_addons(read_table(path, usecols, ITEMS_ADDONS_COLUMNS))
+    result = {}
+    for chunk in iter_table_chunks(path, usecols, ITEMS_ADDONS_COLUMNS, chunk_size):
+        group_items_with_addons(chunk, result)
+    return result
@@ -0,0 +1,178 @@
+import asyncio
+import csv
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from readiness import LatencyHistogram, current_scope
+from credentials import instrumentation_report, instrumentation_trace
+
+
+def _lane():
+    """Trace lane for the current caller: the asyncio task if there is one, else the thread."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+class Instrumentation:
+    """Timed spans and counters for one run, reported as p50/p95 and total time per stage and counts per minute.
+
+    Like readiness, ``timed`` and ``goto`` return an awaitable for async pages, and ``span`` is a plain
+    context manager that also times the awaits inside an async block. Inside readiness.metrics_scope,
+    spans and counters are also kept for that scope, and print_report shows just the scope's. Inside
+    defer_files, finish only prints, so a run made of several stages writes its files once at the end.
+    """
+
+    def __init__(self, report_path=None, trace_path=None):
+        self.report_path = report_path
+        self.trace_path = trace_path
+        self.lock = threading.Lock()
+        self.deferred = 0
+        self.reset()
+
+    def reset(self):
+        """Forget every span and counter and restart the run clock."""
+        self.histograms = {}
+        self.totals = {}
+        self.counters = {}
+        self.trace_events = []
+        self.scopes = {}
+        self.started = time.perf_counter()
+
+    def _targets(self):
+        """The run totals, and the current scope's as well when there is one (call with the lock held)."""
+        scope = current_scope()
+        if scope is None:
+            return [self]
+        if scope not in self.scopes:
+            self.scopes[scope] = Instrumentation()
+        return [self, self.scopes[scope]]
+
+    def _record(self, name, start, ok=True, attributes=None):
+        end = time.perf_counter()
+        elapsed_ms = (end - start) * 1000
+        with self.lock:
+            for target in self._targets():
+                target.histograms.setdefault(name, LatencyHistogram()).record(elapsed_ms, ok)
+                target.totals[name] = target.totals.get(name, 0) + elapsed_ms
+            if self.trace_path:
+                self.trace_events.append({
+                    'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': _lane(),
+                    'ts': (start - self.started) * 1e6, 'dur': elapsed_ms * 1000,
+                    'args': dict(attributes or {}, ok=ok)})
+
+    @contextmanager
+    def span(self, name, **attributes):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self._record(name, start, ok=False, attributes=attributes)
+            raise
+        self._record(name, start, attributes=attributes)
+
+    def timed(self, name, call, **attributes):
+        """Run call() as a span; an awaitable result is timed until it completes."""
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception:
+            self._record(name, start, ok=False, attributes=attributes)
+            raise
+        if inspect.isawaitable(result):
+            return self._timed_async(name, start, result, attributes)
+        self._record(name, start, attributes=attributes)
+        return result
+
+    async def _timed_async(self, name, start, awaitable, attributes):
+        try:
+            result = await awaitable
+        except Exception:
+            self._record(name, start, ok=False, attributes=attributes)
+            raise
+        self._record(name, start, attributes=attributes)
+        return result
+
+    def goto(self, page, url, name="goto", **kwargs):
+        return self.timed(name, lambda: page.goto(url, **kwargs), url=url)
+
+    def count(self, name, value=1):
+        with self.lock:
+            for target in self._targets():
+                target.counters[name] = target.counters.get(name, 0) + value
+
+    def report(self, scope=None):
+        """Spans and counters for the whole run, or for one scope since its first record."""
+        if scope is not None:
+            with self.lock:
+                scoped = self.scopes.get(scope)
+            return scoped.report() if scoped is not None else {'duration_s': 0, 'spans': {}, 'counters': {}}
+        elapsed_min = max(time.perf_counter() - self.started, 1e-9) / 60
+        with self.lock:
+            spans = {}
+            for name, histogram in sorted(self.histograms.items()):
+                spans[name] = histogram.as_dict()
+                spans[name]['total_s'] = round(self.totals[name] / 1000, 3)
+            counters = {name: {'count': count, 'per_minute': round(count / elapsed_min, 1)}
+                        for name, count in sorted(self.counters.items())}
+        return {'duration_s': round(elapsed_min * 60, 1), 'spans': spans, 'counters': counters}
+
+    def print_report(self):
+        report = self.report(current_scope())
+        for name, stats in report['spans'].items():
+            print(f"[span] {name}: n={stats['count']} failed={stats['failures']} total={stats['total_s']:.1f}s "
+                  f"p50={stats['p50_ms'] or 0:.0f}ms p95={stats['p95_ms'] or 0:.0f}ms")
+        for name, stats in report['counters'].items():
+            print(f"[count] {name}: {stats['count']} ({stats['per_minute']}/min)")
+
+    def save_report(self, path):
+        """Write the report as JSON, or as one CSV row per span and counter when path ends in .csv."""
+        report = self.report()
+        if not path.lower().endswith(".csv"):
+            with open(path, "w", encoding="utf-8") as report_file:
+                json.dump(report, report_file, indent=2)
+            return
+        with open(path, "w", newline="", encoding="utf-8") as report_file:
+            writer = csv.writer(report_file)
+            writer.writerow(["kind", "name", "count", "failures", "total_s", "p50_ms", "p95_ms", "max_ms", "per_minute"])
+            for name, stats in report['spans'].items():
+                writer.writerow(["span", name, stats['count'], stats['failures'], stats['total_s'],
+                                 stats['p50_ms'], stats['p95_ms'], stats['max_ms'], ""])
+            for name, stats in report['counters'].items():
+                writer.writerow(["counter", name, stats['count'], "", "", "", "", "", stats['per_minute']])
+
+    def save_trace(self, path):
+        """Write the spans in Chrome trace format, viewable in chrome://tracing or Perfetto."""
+        with self.lock:
+            events = list(self.trace_events)
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file)
+
+    @contextmanager
+    def defer_files(self):
+        """Hold back the report and trace files that finish() would write until the block ends."""
+        with self.lock:
+            self.deferred += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.deferred -= 1
+
+    def finish(self):
+        """Print the report and write the configured report and trace files, unless inside defer_files."""
+        self.print_report()
+        if self.deferred:
+            return
+        if self.report_path:
+            self.save_report(self.report_path)
+        if self.trace_path:
+            self.save_trace(self.trace_path)
+
+
+instrumentation = Instrumentation(instrumentation_report or None, instrumentation_trace or None)
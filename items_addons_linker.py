@@ -1,31 +1,67 @@
-import pandas as pd
 from playwright.sync_api import sync_playwright
-import time
-import re
+import contextvars
 import os
-from credentials import email, password, vendor_name
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from credentials import email, password, vendor_name, portal_url, linker_workers, linker_catalog_index, linker_catalog_ttl
+from readiness import readiness
+from browser_pool import launch_browser
+from browser_profile import profile, network_metrics
+from instrumentation import instrumentation
+from catalog_index import CatalogIndex
+from ingestion import read_items_with_addons
+from run_journal import RunJournal
+from recovery import recovery, RowFailed, VALIDATION
+import text_normalization
+from text_normalization import canonical_key, addon_match_key
+
+# Reads every addon row of an item page in one round trip, as plain values, so no row handle outlives the call.
+ADDON_ROWS_SCRIPT = """(rows, linkPrefix) => rows.map(row => {
+    const cell = n => { const td = row.querySelector(`td:nth-child(${n})`); return td ? td.textContent.trim() : null; };
+    const link = row.querySelector(`a[href^="${linkPrefix}"]`);
+    return {category: cell(2), status: cell(3), name: cell(4), price: cell(5), link: link ? link.getAttribute('href') : null};
+})"""
+
+class Throttle:
+    """Space out requests to the vendor portal across all worker threads."""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
 
 class ItemsAddonsLinker:
-    LOGIN_URL = "https://vendor.elitewherego.com/login"
-    MAIN_URL = "https://vendor.elitewherego.com/items"
+    LOGIN_URL = f"{portal_url}/login"
+    MAIN_URL = f"{portal_url}/items"
 
-    def __init__(self, username, password, excel_path):
+    def __init__(self, username, password, excel_path, workers=1, min_interval=0.5,
+                 use_catalog_index=False, catalog_ttl=3600, refresh_catalog=False, journal_path=None, chunk_size=None,
+                 cdp_endpoint=None, storage_state_path=None):
         self.username = username
         self.password = password
         self.excel_path = excel_path
+        self.chunk_size = chunk_size
+        self.cdp_endpoint = cdp_endpoint
+        self.storage_state_path = storage_state_path
+        self.workers = workers
+        self.throttle = Throttle(min_interval if workers > 1 else 0)
+        self.refresh_catalog = refresh_catalog
+        self.catalog = CatalogIndex(f"{excel_path}.catalog.json", self.item_key, catalog_ttl) if use_catalog_index else None
+        self.journal = RunJournal(journal_path, "item_links") if journal_path else None
 
-    @staticmethod
-    def sanitize_text(text: str, allow_spaces: bool = True) -> str:
-        allowed_chars = r"[^a-zA-Z0-9_\-.\\ ]"
-        sanitized = re.sub(allowed_chars, "", text)
-        sanitized = re.sub(r"\s+", " ", sanitized).strip()
-        if not allow_spaces:
-            sanitized = sanitized.replace(" ", "_")
-        return sanitized
-
-    @staticmethod
-    def normalize_text(text):
-        return "".join(text.lower().split())
+    sanitize_text = staticmethod(text_normalization.sanitize_text)
+    normalize_text = staticmethod(text_normalization.normalize_text)
 
     @staticmethod
     def scroll_to_element(page, selector):
@@ -33,11 +69,10 @@ class ItemsAddonsLinker:
 
     @staticmethod
     def wait_for_loading(page, timeout=3000):
-        try:
-            page.wait_for_function("document.documentElement.classList.contains('nprogress-busy')", timeout=timeout)
-            page.wait_for_function("!document.documentElement.classList.contains('nprogress-busy')", timeout=timeout)
-        except:
-            time.sleep(2)
+        if not readiness.wait_for_nprogress(page, name="search", timeout=timeout):
+            instrumentation.count("search_busy_not_seen")
+            print("[Search] the portal never showed its busy state; the results may be from the previous search")
+
     @staticmethod
     def format_number(value):
         if isinstance(value, (int, float)):
@@ -49,50 +84,114 @@ class ItemsAddonsLinker:
             raise ValueError("Input must be an int or float")
 
     def extract_items_with_addons(self):
-        df = pd.read_excel(self.excel_path, usecols=[0, 1, 2, 3, 4, 5],
-                           names=['category_name', 'item_name', 'addon_category', 'addon_name', 'addon_price', 'category_status'])
-        result = {}
-        for _, row in df.iterrows():
-            item = row['item_name']
-            addon_details = [row['category_name'], row['addon_category'], row['addon_name'], self.format_number(row['addon_price']), row['category_status']]
-            result.setdefault(item, []).append(addon_details)
-        return result
+        return read_items_with_addons(self.excel_path, self.chunk_size)
+
+    item_key = staticmethod(canonical_key)
+
+    def build_catalog(self, page):
+        """Load or crawl the vendor catalog index when catalog mode is on."""
+        if self.catalog is not None:
+            self.catalog.ensure(page, self.MAIN_URL, "table.w-full.whitespace-nowrap", self.extract_item_links,
+                                wait=lambda p: readiness.wait_for_selector(p, 'table.w-full.whitespace-nowrap', name="catalog_page"),
+                                refresh=self.refresh_catalog)
+
+    def find_item_link(self, page, item_name, expected_category):
+        """Return the edit link for an item, from the catalog index or from a portal search."""
+        if self.catalog is not None:
+            return self.catalog.lookup(item_name, expected_category)
+
+        sanitized_item = self.sanitize_text(item_name)
+        page.fill("#search", sanitized_item)
+        self.wait_for_loading(page)
+
+        table = page.query_selector("table.w-full.whitespace-nowrap")
+        if not table:
+            return None
+
+        for item_link in self.extract_item_links(table):
+            if self.is_matching_item(item_link, item_name, expected_category):
+                return item_link["link"]
+        return None
 
     def login(self, page):
-        page.goto(self.LOGIN_URL)
+        """Log in unless the saved storage state is still signed in, then save the session for the next run."""
+        instrumentation.goto(page, self.LOGIN_URL)
+        if "/login" not in page.url:
+            return
         page.fill("#email", self.username)
         page.fill("input[type='password']", self.password)
         page.click("button[type='submit']")
-        page.wait_for_url('https://vendor.elitewherego.com/')
+        page.wait_for_url(f"{portal_url}/")
+        if self.storage_state_path:
+            page.context.storage_state(path=self.storage_state_path)
 
-    def process_items(self, page, items_data):
-        page.goto(self.MAIN_URL)
+    def reset(self, page):
+        """Put the page back on the items table, where every item starts."""
+        instrumentation.goto(page, self.MAIN_URL)
+        readiness.wait_for_selector(page, 'table.w-full.whitespace-nowrap', name="items_table")
 
-        for item_name, attributes in items_data.items():
-            try:
-                sanitized_item = self.sanitize_text(item_name)
-                page.fill("#search", sanitized_item)
-                self.wait_for_loading(page)
+    def process_item(self, page, item_name, attributes, linked_keys):
+        """Find one item and link its addons; returns None when the item is not in the portal."""
+        self.throttle.wait()
+        with instrumentation.span("find_item"):
+            item_url = self.find_item_link(page, item_name, attributes[0][0])
+        if not item_url:
+            return None
 
-                table = page.query_selector("table.w-full.whitespace-nowrap")
-                if not table:
-                    continue
+        with instrumentation.span("link_item", item=item_name):
+            linked = self.process_addons_for_item(page, item_url, attributes, linked_keys)
+        if self.catalog is None:
+            instrumentation.goto(page, self.MAIN_URL)
+        return linked
 
-                item_links = self.extract_item_links(table)
-                for item_link in item_links:
-                    if self.is_matching_item(item_link, item_name, attributes[0][0]):
-                        self.process_addons_for_item(page, item_link["link"], attributes)
-                        break  # If matched and processed, no need to check more links
+    def process_items(self, page, items_data):
+        """Link addons for every item and return {item_name: (status, addons_linked)}.
 
-                page.goto(self.MAIN_URL)
+        Items that fail for a retryable reason get one more pass once the rest are done.
+        """
+        results = {}
+        linked_keys = {}
+        retry_items = self.link_items(page, items_data, results, linked_keys)
+        if retry_items:
+            print(f"Retrying {len(retry_items)} failed items")
+            self.link_items(page, retry_items, results, linked_keys, final_pass=True)
+        return results
 
-            except Exception as e:
+    def link_items(self, page, items_data, results, linked_keys, final_pass=False):
+        """Process items into results and return the ones to try again in a final pass."""
+        retry_items = {}
+        self.reset(page)
+
+        for item_name, attributes in items_data.items():
+            item_linked_keys = linked_keys.setdefault(item_name, set())
+            try:
+                found = recovery.run(lambda: self.process_item(page, item_name, attributes, item_linked_keys),
+                                     page, self.login, self.reset)
+            except RowFailed as e:
+                self.reset(page)
+                if e.kind != VALIDATION and not final_pass:
+                    retry_items[item_name] = attributes
+                    continue
                 print(f"[Item Error] '{item_name}': {e}")
-                page.goto(self.MAIN_URL)
-                page.wait_for_selector('table.w-full.whitespace-nowrap')
+                results[item_name] = ("error", len(item_linked_keys))
+                instrumentation.count("items_failed")
+                if self.journal:
+                    self.journal.record(item_name, "failed", e)
+                continue
+
+            if found is None:
+                results[item_name] = ("not_found", 0)
+                instrumentation.count("items_not_found")
+                continue
+            results[item_name] = ("linked", len(item_linked_keys))
+            instrumentation.count("items_linked")
+            instrumentation.count("addons_linked", len(item_linked_keys))
+            if self.journal:
+                self.journal.record(item_name, "done")
+        return retry_items
 
     def extract_item_links(self, table):
-        edit_buttons = table.query_selector_all("a[href^='https://vendor.elitewherego.com/items/']")
+        edit_buttons = table.query_selector_all(f"a[href^='{self.MAIN_URL}/']")
         rows = table.query_selector_all("tr.hover\\:bg-gray-100.focus-within\\:bg-gray-100")
         return [
             {
@@ -106,51 +205,58 @@ class ItemsAddonsLinker:
 
     def is_matching_item(self, item_link, item_name, expected_category):
         return (
-            self.sanitize_text(self.normalize_text(item_link['title'])) == self.sanitize_text(self.normalize_text(item_name)) and
-            self.sanitize_text(self.normalize_text(item_link['category'])) == self.sanitize_text(self.normalize_text(expected_category))
+            canonical_key(item_link['title']) == canonical_key(item_name) and
+            canonical_key(item_link['category']) == canonical_key(expected_category)
         )
 
-    def process_addons_for_item(self, page, item_url, addon_attributes):
-        page.goto(item_url)
-        page.wait_for_selector('tr.hover\\:bg-gray-100')
-        page.wait_for_timeout(3000)
+    def process_addons_for_item(self, page, item_url, addon_attributes, linked_keys=None):
+        """Visit the link of every matching addon and return how many were linked.
 
-        # Step 1: Cache all current addon rows
-        addon_rows = page.query_selector_all('tr.hover\\:bg-gray-100')
-        addon_data = []
+        Keys already in linked_keys, from an earlier attempt at this item, are skipped; new ones are added.
+        If any link could not be followed, the last error is raised once the others are done, so the item
+        is retried (for just the missing links) and is never journaled done while partly linked.
+        """
+        linked_keys = set() if linked_keys is None else linked_keys
+        instrumentation.goto(page, item_url)
+        readiness.wait_for_selector(page, 'tr.hover\\:bg-gray-100', name="item_addons")
 
-        # Step 2: Parse addon rows into usable dicts
-        for row in addon_rows:
-            try:
-                data = {
-                    "row": row,
-                    "category": self.sanitize_text(self.normalize_text(row.query_selector("td:nth-child(2)").text_content().strip())),
-                    "status": row.query_selector("td:nth-child(3)").text_content().strip(),
-                    "name": self.sanitize_text(self.normalize_text(row.query_selector("td:nth-child(4)").text_content().strip())),
-                    "price": row.query_selector("td:nth-child(5)").text_content().strip(),
-                    "link": row.query_selector('a[href^="https://vendor.elitewherego.com/addaddon/"]').get_attribute("href")
-                }
-                addon_data.append(data)
-            except Exception as e:
-                print(f"[Parse Addon Row Error] {e}")
+        # Step 1: Read all current addon rows in one call
+        addon_rows = page.eval_on_selector_all('tr.hover\\:bg-gray-100', ADDON_ROWS_SCRIPT, f"{portal_url}/addaddon/")
+        addon_data = {}
+
+        # Step 2: Key the rows on (category, name, price, status)
+        for data in addon_rows:
+            missing = ["link"] if not data["link"] else []
+            missing += [field for field in ("category", "name", "price") if data[field] is None]
+            if missing:
+                print(f"[Parse Addon Row Error] no addon {', '.join(missing)} in row {data}")
+                continue
+            key = addon_match_key(data["category"], data["name"], data["price"], data["status"])
+            addon_data.setdefault(key, data)
 
-        # Step 3: Search for matching addon from cached data
+        # Step 3: Look up each matching addon in the cached data
+        linked = 0
+        error = None
         for addon_attr in addon_attributes:
-            for addon in addon_data:
-                if (addon["category"] == self.sanitize_text(self.normalize_text(addon_attr[1])) and
-                    addon["name"] == self.sanitize_text(self.normalize_text(addon_attr[2])) and
-                    addon["price"] == str(addon_attr[3]) and
-                    addon["status"] == addon_attr[4]):
-
-                    try:
-                        print(f"Found matching addon, visiting: {addon['link']}")
-                        page.goto(addon["link"])
-                        page.wait_for_selector('tr.hover\\:bg-gray-100')
-                        page.wait_for_timeout(1000)
-                        break  # move to next addon_attr
-                    except Exception as e:
-                        print(f"[Addon Goto Error] {e}")
-                    break
+            key = addon_match_key(addon_attr[1], addon_attr[2], addon_attr[3], addon_attr[4])
+            addon = addon_data.get(key)
+            if addon is None or key in linked_keys:
+                continue
+            try:
+                print(f"Found matching addon, visiting: {addon['link']}")
+                self.throttle.wait()
+                instrumentation.goto(page, addon["link"], name="goto_addon_link")
+                readiness.wait_for_selector(page, 'tr.hover\\:bg-gray-100', name="addon_link")
+                linked += 1
+                linked_keys.add(key)
+            except Exception as e:
+                if "/login" in page.url:
+                    raise
+                print(f"[Addon Goto Error] {e}")
+                error = e
+        if error is not None:
+            raise error
+        return linked
 
     # def is_matching_addon(self, row, addon_attr):
     #     addon_category = self.sanitize_text(self.normalize_text(row.query_selector("td:nth-child(2)").text_content().strip()))
@@ -165,23 +271,107 @@ class ItemsAddonsLinker:
     #         addon_status == addon_attr[4]
     #     )
 
-    def run(self):
-        items_data = self.extract_items_with_addons()
+    def login_storage_state(self):
+        """Log in once and return the authenticated storage state for the worker contexts."""
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            context = browser.new_context()
+            browser = launch_browser(p, self.cdp_endpoint)
+            context = profile.new_context(browser, self.storage_state_path)
+            page = context.new_page()
+            self.login(page)
+            self.build_catalog(page)
+            storage_state = context.storage_state()
+            browser.close()
+        return storage_state
+
+    def process_shard(self, storage_state, shard):
+        """Process one shard of items in its own browser, reusing the shared login."""
+        with sync_playwright() as p:
+            browser = launch_browser(p, self.cdp_endpoint)
+            context = profile.new_context(browser, storage_state=storage_state)
+            results = self.process_items(context.new_page(), shard)
+            browser.close()
+        return results
+
+    def run_parallel(self, items_data):
+        """Shard items round-robin across self.workers browser contexts sharing one login."""
+        storage_state = self.login_storage_state()
+        items = list(items_data.items())
+        shards = [dict(items[index::self.workers]) for index in range(self.workers)]
+        results = {}
+        # Each worker runs in a copy of this thread's context, so its metrics stay in the caller's scope.
+        contexts = [contextvars.copy_context() for _ in shards]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for shard_results in executor.map(lambda context, shard: context.run(self.process_shard, storage_state, shard),
+                                              contexts, shards):
+                results.update(shard_results)
+        return results
+
+    def run_stream(self, item_queue):
+        """Link item batches ({item_name: addons}) as they arrive on item_queue until None, and return the results."""
+        results = {}
+        with sync_playwright() as p:
+            browser = launch_browser(p, self.cdp_endpoint)
+            context = profile.new_context(browser, self.storage_state_path)
             page = context.new_page()
 
             self.login(page)
-            self.process_items(page, items_data)
+            self.build_catalog(page)
+            while True:
+                items_data = item_queue.get()
+                if items_data is None:
+                    break
+                results.update(self.process_items(page, items_data))
 
             browser.close()
+        return results
+
+    @staticmethod
+    def print_results(results, elapsed):
+        statuses = {}
+        for status, _ in results.values():
+            statuses[status] = statuses.get(status, 0) + 1
+        addons_linked = sum(linked for _, linked in results.values())
+        print(f"Processed {len(results)} items in {elapsed:.0f}s: "
+              + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items()))
+              + f"; {addons_linked} addons linked")
+        for item_name, (status, _) in results.items():
+            if status != "linked":
+                print(f"  [{status}] {item_name}")
+
+    def run(self):
+        items_data = self.extract_items_with_addons()
+        if self.journal:
+            items_data = {item_name: items_data[item_name] for item_name in self.journal.pending(list(items_data))}
+        start = time.monotonic()
+        if self.workers > 1:
+            results = self.run_parallel(items_data)
+        else:
+            with sync_playwright() as p:
+                browser = launch_browser(p, self.cdp_endpoint)
+                context = profile.new_context(browser, self.storage_state_path)
+                page = context.new_page()
+
+                self.login(page)
+                self.build_catalog(page)
+                results = self.process_items(page, items_data)
+
+                browser.close()
+        self.print_results(results, time.monotonic() - start)
+        if self.journal:
+            print(self.journal.summary())
+        readiness.print_report()
+        network_metrics.print_report()
+        instrumentation.finish()
+        return results
 
 desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
-desktop_path = desktop_path.replace("\\", "\\\\")
 
 if __name__ == "__main__":
-    EXCEL_PATH = f"{desktop_path}\\{vendor_name}\\addons\\items_addons.xlsx"
+    EXCEL_PATH = os.path.join(desktop_path, vendor_name, "addons", "items_addons.xlsx")
 
-    automation = ItemsAddonsLinker(email, password, EXCEL_PATH)
+    automation = ItemsAddonsLinker(email, password, EXCEL_PATH, workers=linker_workers,
+                                   use_catalog_index=linker_catalog_index, catalog_ttl=linker_catalog_ttl,
+                                   refresh_catalog="--refresh-catalog" in sys.argv,
+                                   journal_path=os.path.join(desktop_path, vendor_name, "addons", "journal.sqlite"),
+                                   storage_state_path=os.path.join(desktop_path, vendor_name, "addons", "portal_state.json"))
     automation.run()
\ No newline at end of file
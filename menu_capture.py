@@ -0,0 +1,187 @@
+import asyncio
+import base64
+import json
+import re
+
+TALABAT_URL_PATTERN = r"talabat\.com/.*(menu|choice)"
+DELIVEROO_URL_PATTERN = r"deliveroo\..*/(menu|api)"
+NEXT_DATA_PATTERN = re.compile(r'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+
+
+class MenuResponseCapture:
+    """Collect the JSON menu/modifier payloads a storefront page loads, instead of clicking through item modals."""
+
+    def __init__(self, url_pattern):
+        self.url_pattern = re.compile(url_pattern)
+        self.payloads = []
+        self._pending = []
+
+    def wants(self, response):
+        content_type = response.headers.get("content-type", "")
+        return "json" in content_type and bool(self.url_pattern.search(response.url))
+
+    def attach(self, page):
+        """Listen for responses on a sync API page."""
+        def on_response(response):
+            if self.wants(response):
+                try:
+                    self.payloads.append(response.json())
+                except Exception as e:
+                    print(f"Error reading response {response.url}: {e}")
+        page.on("response", on_response)
+
+    def attach_async(self, page):
+        """Listen for responses on an async API page; await drain() before reading payloads."""
+        async def read(response):
+            try:
+                self.payloads.append(await response.json())
+            except Exception as e:
+                print(f"Error reading response {response.url}: {e}")
+
+        def on_response(response):
+            if self.wants(response):
+                self._pending.append(asyncio.ensure_future(read(response)))
+        page.on("response", on_response)
+
+    async def drain(self):
+        """Wait for every response body that is still being read."""
+        while self._pending:
+            pending, self._pending = self._pending, []
+            await asyncio.gather(*pending)
+
+    def add_html(self, html):
+        """Add the __NEXT_DATA__ state embedded in a server-rendered page, if there is one."""
+        match = NEXT_DATA_PATTERN.search(html)
+        if match:
+            self.payloads.append(json.loads(match.group(1)))
+
+    def add_choices(self, item_id, payload):
+        """Add the choices response loaded for one item, keyed on item_id since the response may not carry it."""
+        sections = next(_walk(payload, "choiceSections"), None)
+        if sections is None:
+            sections = payload if isinstance(payload, list) else []
+        self.payloads.append({"choiceForItem": [{"id": item_id, "choiceSections": sections}]})
+
+    def load_har(self, har_path):
+        """Load matching JSON payloads from a saved HAR file, for offline runs."""
+        with open(har_path, encoding="utf-8") as har_file:
+            har = json.load(har_file)
+        for entry in har["log"]["entries"]:
+            content = entry["response"].get("content", {})
+            text = content.get("text")
+            if not text or not self.url_pattern.search(entry["request"]["url"]):
+                continue
+            if content.get("encoding") == "base64":
+                text = base64.b64decode(text).decode("utf-8")
+            if "json" in content.get("mimeType", ""):
+                self.payloads.append(json.loads(text))
+            elif "html" in content.get("mimeType", ""):
+                self.add_html(text)
+
+    def load_json(self, json_path):
+        """Load a saved payload (or a list of payloads) from a JSON fixture file."""
+        with open(json_path, encoding="utf-8") as json_file:
+            payload = json.load(json_file)
+        self.payloads.extend(payload if isinstance(payload, list) else [payload])
+
+
+def _get(data, *keys, default=None):
+    """Return the first key present in data; storefront payloads use both long and short field names."""
+    for key in keys:
+        if isinstance(data, dict) and data.get(key) is not None:
+            return data[key]
+    return default
+
+
+def _walk(data, key):
+    """Yield every value stored under key anywhere in a nested payload."""
+    if isinstance(data, dict):
+        for k, value in data.items():
+            if k == key:
+                yield value
+            yield from _walk(value, key)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _walk(value, key)
+
+
+def _format_price(price):
+    if isinstance(price, dict):
+        return _get(price, "formatted", "fractional", default='')
+    if isinstance(price, (int, float)):
+        return f"{price:.2f}" if price else '0'
+    return price or '0'
+
+
+def talabat_menu_items(payloads):
+    """Map Talabat menu and choice payloads into menu items with their addon categories.
+
+    Menu sections are read from ``menuSection`` (``name``/``nm``, items under ``itemModels``/``itm``)
+    and item choices from ``choiceSections`` (``nm``, ``mnq``/``mxq`` and options under ``ich``),
+    keyed by the item id the payload was loaded for.
+    """
+    choices = {}
+    for payload in payloads:
+        for choice_for_item in _walk(payload, "choiceForItem"):
+            for entry in choice_for_item if isinstance(choice_for_item, list) else [choice_for_item]:
+                choices[str(_get(entry, "id", "itemId"))] = _get(entry, "choiceSections", "chs", default=[])
+
+    menu_items = []
+    for payload in payloads:
+        for sections in _walk(payload, "menuSection"):
+            for section in sections:
+                for item in _get(section, "itemModels", "itm", default=[]):
+                    item_id = str(_get(item, "id"))
+                    addon_categories = []
+                    for choice_section in choices.get(item_id, []):
+                        addons = [{'name': _get(option, "name", "nm", default='').split('(')[0].strip(),
+                                   'price': _format_price(_get(option, "price", "pr", default=0))}
+                                  for option in _get(choice_section, "ich", "items", default=[])]
+                        min_quantity = _get(choice_section, "mnq", "minQuantity", default=0)
+                        addon_categories.append({
+                            'name': _get(choice_section, "nm", "name", default=''),
+                            'required': min_quantity > 0,
+                            'count': _get(choice_section, "mxq", "maxQuantity", default=len(addons)),
+                            'addons': addons,
+                        })
+                    menu_items.append({
+                        'id': item_id,
+                        'category_name': _get(section, "name", "nm", default=''),
+                        'item_name': _get(item, "name", "nm", default='').strip(),
+                        'has_choices': bool(_get(item, "hasChoices", "hc", default=item_id in choices)),
+                        'addon_categories': addon_categories,
+                    })
+    return menu_items
+
+
+def deliveroo_menu_items(payloads):
+    """Map Deliveroo menu state (``meta.items``, ``meta.categories``, ``meta.modifierGroups``) into menu items."""
+    menu_items = []
+    for payload in payloads:
+        for meta in _walk(payload, "meta"):
+            if not isinstance(meta, dict) or "items" not in meta:
+                continue
+            categories = {category["id"]: category.get("name", '') for category in meta.get("categories", [])}
+            groups = {group["id"]: group for group in meta.get("modifierGroups", [])}
+            for item in meta["items"]:
+                addon_categories = []
+                for group_id in item.get("modifierGroupIds", []):
+                    group = groups.get(group_id)
+                    if not group:
+                        continue
+                    addons = [{'name': option.get("name", ''), 'price': _format_price(option.get("price"))}
+                              for option in group.get("modifierOptions", [])]
+                    addon_categories.append({
+                        'name': group.get("name", ''),
+                        'required': group.get("minSelection", 0) > 0,
+                        'count': group.get("maxSelection") or len(addons),
+                        'addons': addons,
+                    })
+                menu_items.append({
+                    'id': str(item.get("id")),
+                    'category_name': categories.get(item.get("categoryId"), ''),
+                    'item_name': item.get("name", '').strip(),
+                    'has_choices': bool(item.get("modifierGroupIds")),
+                    'addon_categories': addon_categories,
+                })
+    return menu_items
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+
+CARD_TEXT_SCRIPT = "cards => cards.map(card => card.textContent)"
+ROW_KINDS = ["categories", "addons", "items_addons"]
+
+
+def content_hash(*parts):
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _row_key(row):
+    return json.dumps(list(row.values()), ensure_ascii=False)
+
+
+class MenuSnapshot:
+    """The last scrape of a vendor's menu: the rows each item card produced, keyed on a hash of the card.
+
+    An item card (name, price, description) that hashes the same as last time reuses its previous rows
+    instead of opening the item modal again. In a category where an item failed, the previous items
+    this scrape did not see are carried forward, so a failed item is not reported as removed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.previous = {"categories": {}, "items": {}}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as snapshot_file:
+                self.previous = json.load(snapshot_file)
+        self.items = {}
+        self.categories = {}
+        self.reused = 0
+        self.failed_categories = set()
+        self._previous_row_keys = None
+
+    def item_key(self, category_name, card_text):
+        return content_hash(category_name, " ".join((card_text or "").split()))
+
+    def previous_rows(self, item_key):
+        item = self.previous["items"].get(item_key)
+        if item is None:
+            return None
+        self.reused += 1
+        return item["rows"]
+
+    def keep(self, item_key, rows, category_name):
+        """Record the (category, addon, item-addon) rows an item produced in this scrape."""
+        self.items[item_key] = {"category": category_name,
+                                "rows": [[dict(row.items()) for row in kind_rows] for kind_rows in rows]}
+        self.categories.setdefault(category_name, []).append(item_key)
+
+    def mark_failed(self, category_name):
+        """Note that an item in the category failed in this scrape."""
+        self.failed_categories.add(category_name)
+
+    def _carry_failed(self):
+        for item_key, item in self.previous["items"].items():
+            if item.get("category") in self.failed_categories and item_key not in self.items:
+                self.items[item_key] = item
+                self.categories.setdefault(item["category"], []).append(item_key)
+
+    def category_hashes(self):
+        return {category_name: content_hash(sorted(item_keys)) for category_name, item_keys in self.categories.items()}
+
+    def save(self):
+        self._carry_failed()
+        with open(self.path, "w", encoding="utf-8") as snapshot_file:
+            json.dump({"categories": self.category_hashes(), "items": self.items}, snapshot_file, ensure_ascii=False)
+
+    def _rows(self, items, kind):
+        index = ROW_KINDS.index(kind)
+        rows = {}
+        for item in items.values():
+            for row in item["rows"][index]:
+                rows.setdefault(_row_key(row), row)
+        return rows
+
+    def is_new(self, kind, row):
+        """True if row was not produced by the previous scrape."""
+        if self._previous_row_keys is None:
+            self._previous_row_keys = {kind_name: set(self._rows(self.previous["items"], kind_name)) for kind_name in ROW_KINDS}
+        return _row_key(row) not in self._previous_row_keys[kind]
+
+    def diff(self):
+        """Added, removed and changed rows between the previous scrape and this one, for the upload scripts.
+
+        A changed addon (same category and name, new price or status) is listed under "changed" and
+        also as one removed and one added row.
+        """
+        self._carry_failed()
+        result = {
+            "categories_changed": sorted(
+                name for name, category_hash in self.category_hashes().items()
+                if self.previous["categories"].get(name) != category_hash),
+            "categories_removed": sorted(set(self.previous["categories"]) - set(self.categories)),
+        }
+        for kind in ROW_KINDS:
+            before, after = self._rows(self.previous["items"], kind), self._rows(self.items, kind)
+            result[kind] = {
+                "added": [row for key, row in after.items() if key not in before],
+                "removed": [row for key, row in before.items() if key not in after],
+            }
+
+        before_addons = {(row["addon_category"], row["addon_name"]): row for row in result["addons"]["removed"]}
+        changed = []
+        for row in result["addons"]["added"]:
+            previous_row = before_addons.get((row["addon_category"], row["addon_name"]))
+            if previous_row is not None:
+                changed.append({"before": previous_row, "after": row})
+        result["addons"]["changed"] = changed
+        return result
+
+    def save_diff(self, path=None):
+        """Write diff() next to the snapshot (or to path) and print a one-line summary."""
+        path = path or f"{os.path.splitext(self.path)[0]}_diff.json"
+        diff = self.diff()
+        with open(path, "w", encoding="utf-8") as diff_file:
+            json.dump(diff, diff_file, ensure_ascii=False, indent=2)
+        print(f"Menu diff: {len(diff['addons']['added'])} addons added, {len(diff['addons']['removed'])} removed, "
+              f"{len(diff['addons']['changed'])} changed; {self.reused} items reused from the last snapshot")
+        return diff
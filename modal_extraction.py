@@ -0,0 +1,37 @@
+MODAL_SCRIPT = """
+(spec) => {
+    const text = (element) => element ? element.textContent : null;
+    const first = (element, selectors) => {
+        for (const selector of selectors) {
+            const found = element.querySelector(selector);
+            if (found) return found;
+        }
+        return null;
+    };
+    const modal = document.querySelector(spec.window);
+    if (!modal) return null;
+    return Array.from(modal.querySelectorAll(spec.category)).map((category) => ({
+        name: text(category.querySelector(spec.name)),
+        marked: category.querySelector(spec.marker) !== null,
+        count_text: spec.count ? text(category.querySelector(spec.count)) : null,
+        fallback_count: category.querySelectorAll(spec.count_fallback).length,
+        addons: Array.from(category.querySelectorAll(spec.addon)).map((addon) => ({
+            name: text(first(addon, spec.addon_name)),
+            price: text(first(addon, spec.addon_price)),
+        })),
+    }));
+}
+"""
+
+
+def read_modal(page, spec):
+    """Read a whole addon modal in a single evaluate() round trip.
+
+    spec maps the selectors to read: ``window`` (the modal root), ``category``, ``name``, ``marker``
+    (its presence sets ``marked``), ``count``, ``count_fallback``, ``addon``, and ``addon_name`` /
+    ``addon_price`` (lists of selectors, first match wins). Returns None when the modal is not open,
+    otherwise a list of categories with ``name``, ``marked``, ``count_text``, ``fallback_count`` and
+    ``addons`` (``name`` / ``price`` text, None when missing). Works on sync and async pages alike;
+    await the result on an async page.
+    """
+    return page.evaluate(MODAL_SCRIPT, spec)
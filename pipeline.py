@@ -0,0 +1,177 @@
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+import time
+import pandas as pd
+from playwright.async_api import async_playwright
+import addons_categories_creator
+import addons_uploader
+from browser_pool import launch_browser
+from browser_profile import profile
+from catalog_index import ListingIndex, crawl_listing_async
+from ingestion import ITEMS_ADDONS_COLUMNS, group_items_with_addons
+from instrumentation import instrumentation
+from items_addons_linker import ItemsAddonsLinker
+from run_journal import RunJournal
+
+
+def category_row(row):
+    """A scraped addon_cat row in the shape addons_categories_creator reads from addon_cat.xlsx."""
+    return {'category': row['addon_category'], 'category_status': row['category_status'], 'count': row['addon_count_line']}
+
+
+def addon_row(row):
+    """A scraped addons row in the shape addons_uploader reads from addons.xlsx."""
+    return {'addon_category': row['addon_category'], 'addon_name': row['addon_name'], 'addon_price': row['addon_price']}
+
+
+class StreamingPipeline:
+    """Create categories, upload addons and link items while the menu is still being scraped.
+
+    ``scrape(on_records)`` runs in a worker thread and calls on_records with each batch of new
+    (category, addon, item-addon) rows. Batches go through an asyncio queue to one portal page that
+    creates the batch's categories and then uploads its addons. The batch's items are then handed to
+    the linker, which runs its sync browser in a third thread, so an item is only linked once its
+    addons exist. Rows that fail for a retryable reason get a final pass after the scrape ends, and
+    items that need those rows wait for it.
+    """
+
+    def __init__(self, scrape, username, password, base_path, link=True, journal_path=None, storage_state_path=None,
+                 cdp_endpoint=None, **linker_options):
+        self.scrape = scrape
+        self.username = username
+        self.password = password
+        self.storage_state_path = storage_state_path
+        self.cdp_endpoint = cdp_endpoint
+        os.makedirs(base_path, exist_ok=True)
+        journal_path = journal_path or os.path.join(base_path, "journal.sqlite")
+        self.category_journal = RunJournal(journal_path, "addon_categories")
+        self.addon_journal = RunJournal(journal_path, "addons")
+        self.linker = ItemsAddonsLinker(username, password, os.path.join(base_path, "items_addons.xlsx"),
+                                        journal_path=journal_path, cdp_endpoint=cdp_endpoint,
+                                        storage_state_path=storage_state_path, **linker_options) if link else None
+        self.item_queue = queue.Queue()
+        self.link_results = {}
+        self.retry_categories = []
+        self.retry_addons = []
+        self.held_items = []
+
+    def relogin(self, page):
+        return addons_uploader.login(page, self.username, self.password, self.storage_state_path)
+
+    async def create_categories(self, page, rows, categories, final_pass=False):
+        """Create the categories the portal does not have yet and return the refreshed category options."""
+        rows = [row for row in rows if categories.resolve(row['category']) is None]
+        if not rows:
+            return categories
+        await addons_categories_creator.open_create_form(page)
+        self.retry_categories += await addons_categories_creator.upload_rows(page, rows, self.category_journal, self.relogin,
+                                                                              final_pass)
+        return await addons_uploader.read_categories(page)
+
+    async def upload_addons(self, page, rows, categories, existing, final_pass=False):
+        """Upload the addons that are not in the portal yet; rows to try again go to retry_addons."""
+        new_rows = []
+        for row in rows:
+            if existing.contains(*addons_uploader.addon_key(row)):
+                self.addon_journal.record(row, "exists")
+                instrumentation.count("rows_existing")
+            elif categories.resolve(row['addon_category']) is None:
+                if final_pass or not any(retry['category'] == row['addon_category'] for retry in self.retry_categories):
+                    self.addon_journal.record(row, "failed", "category not in the portal")
+                    instrumentation.count("rows_failed")
+                    continue
+                self.retry_addons.append(row)
+            else:
+                new_rows.append(row)
+        retry_rows = await addons_uploader.upload_rows(page, new_rows, categories, self.addon_journal, self.relogin, final_pass)
+        for row in new_rows:
+            if row not in retry_rows:
+                existing.add(*addons_uploader.addon_key(row))
+        self.retry_addons += retry_rows
+
+    def link(self, item_rows):
+        """Queue a batch's items for the linker, holding them back while an addon they need waits for a retry."""
+        if self.linker is None or not item_rows:
+            return
+        if not set(ITEMS_ADDONS_COLUMNS) <= set(item_rows[0].keys()):
+            print("[Pipeline] these item rows carry no item category, so items are not linked")
+            self.linker = None
+            return
+        items_data = group_items_with_addons(pd.DataFrame(item_rows, columns=ITEMS_ADDONS_COLUMNS))
+        waiting = {addons_uploader.addon_key(row) for row in self.retry_addons}
+        if any((row['addon_category'], row['addon_name']) in waiting for row in item_rows):
+            self.held_items.append(items_data)
+        else:
+            self.item_queue.put(items_data)
+
+    async def upload(self, batches):
+        """Consume scraped batches until None, then give failed rows and held items their final pass."""
+        async with async_playwright() as p:
+            browser = await launch_browser(p, self.cdp_endpoint)
+            context = await profile.new_context_async(browser, self.storage_state_path)
+            page = await context.new_page()
+            await self.relogin(page)
+            existing = ListingIndex(await crawl_listing_async(page, addons_uploader.MAIN_URL), addons_uploader.LISTING_COLUMNS)
+            categories = await addons_uploader.read_categories(page)
+
+            while True:
+                records = await batches.get()
+                if records is None:
+                    break
+                cat_rows, addon_rows, item_rows = records
+                with instrumentation.span("pipeline_batch"):
+                    categories = await self.create_categories(page, [category_row(row) for row in cat_rows], categories)
+                    await self.upload_addons(page, [addon_row(row) for row in addon_rows], categories, existing)
+                self.link(item_rows)
+
+            if self.retry_categories or self.retry_addons:
+                print(f"Retrying {len(self.retry_categories)} categories and {len(self.retry_addons)} addons")
+                retry_categories, self.retry_categories = self.retry_categories, []
+                retry_addons, self.retry_addons = self.retry_addons, []
+                categories = await self.create_categories(page, retry_categories, categories, final_pass=True)
+                await self.upload_addons(page, retry_addons, categories, existing, final_pass=True)
+            for items_data in self.held_items:
+                self.item_queue.put(items_data)
+
+            await browser.close()
+
+    def run_linker(self):
+        try:
+            self.link_results.update(self.linker.run_stream(self.item_queue))
+        except Exception as e:
+            print(f"[Pipeline] linker stopped: {e}")
+
+    async def run_async(self):
+        loop = asyncio.get_running_loop()
+        batches = asyncio.Queue()
+        link_thread = threading.Thread(target=contextvars.copy_context().run, args=(self.run_linker,),
+                                       daemon=True) if self.linker is not None else None
+        if link_thread is not None:
+            link_thread.start()
+
+        async def scrape():
+            try:
+                await asyncio.to_thread(self.scrape, lambda records: loop.call_soon_threadsafe(batches.put_nowait, records))
+            finally:
+                batches.put_nowait(None)
+
+        try:
+            await asyncio.gather(scrape(), self.upload(batches))
+        finally:
+            self.item_queue.put(None)
+            if link_thread is not None:
+                await asyncio.to_thread(link_thread.join)
+
+    def run(self):
+        start = time.monotonic()
+        with instrumentation.defer_files():
+            asyncio.run(self.run_async())
+        print(f"[Categories] {self.category_journal.summary()}")
+        print(f"[Addons] {self.addon_journal.summary()}")
+        if self.link_results:
+            ItemsAddonsLinker.print_results(self.link_results, time.monotonic() - start)
+        instrumentation.finish()
+        return self.link_results
@@ -0,0 +1,211 @@
+import asyncio
+import os
+from html.parser import HTMLParser
+from urllib.parse import unquote
+
+import httpx
+
+from catalog_index import ListingIndex, OptionIndex
+from credentials import portal_url
+from instrumentation import instrumentation
+
+BASE_URL = portal_url
+
+
+class FormPageParser(HTMLParser):
+    """Pull the CSRF token and every <select>'s label -> value options out of a portal form page."""
+
+    def __init__(self):
+        super().__init__()
+        self.csrf_token = None
+        self.selects = {}
+        self._select = None
+        self._option = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "meta" and attrs.get("name") == "csrf-token":
+            self.csrf_token = attrs.get("content")
+        elif tag == "input" and attrs.get("name") == "_token":
+            self.csrf_token = attrs.get("value")
+        elif tag == "select":
+            self._select = self.selects.setdefault(attrs.get("id") or attrs.get("name"), {})
+        elif tag == "option" and self._select is not None:
+            self._option = [attrs.get("value"), ""]
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option[1] += data
+
+    def handle_endtag(self, tag):
+        if tag == "option" and self._option is not None:
+            value, label = self._option
+            label = label.strip()
+            self._select[label] = label if value is None else value
+            self._option = None
+        elif tag == "select":
+            self._select = None
+
+
+class TableParser(HTMLParser):
+    """Collect the cell texts of every table row on a listing page."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._row = []
+        elif tag == "td" and self._row is not None:
+            self._cell = ""
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell += data
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self._cell is not None:
+            self._row.append(self._cell.strip())
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            if self._row:
+                self.rows.append(self._row)
+            self._row = None
+
+
+class PortalHttpClient:
+    """Pooled async HTTP session against the vendor portal's form endpoints.
+
+    Logs in with the same Laravel session/CSRF cookies the browser gets, then posts the create
+    forms directly. At most ``concurrency`` form submissions are in flight at once.
+    """
+
+    def __init__(self, base_url=BASE_URL, concurrency=4, timeout=30):
+        self.base_url = base_url
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.client = httpx.AsyncClient(base_url=base_url, timeout=timeout, follow_redirects=False,
+                                        limits=httpx.Limits(max_connections=concurrency))
+        self.csrf_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    def headers(self, referer_path=""):
+        """Request headers; posts name their form page as Referer, since Laravel redirects back there on errors."""
+        headers = {"Accept": "text/html,application/xhtml+xml", "Referer": f"{self.base_url}{referer_path}"}
+        xsrf_cookie = self.client.cookies.get("XSRF-TOKEN")
+        if xsrf_cookie:
+            headers["X-XSRF-TOKEN"] = unquote(xsrf_cookie)
+        return headers
+
+    async def get_form(self, path):
+        """Fetch a form page, refresh the CSRF token and return an OptionIndex per select."""
+        response = await self.client.get(path, headers=self.headers())
+        response.raise_for_status()
+        parser = FormPageParser()
+        parser.feed(response.text)
+        self.csrf_token = parser.csrf_token or self.csrf_token
+        return {field: OptionIndex(choices.items()) for field, choices in parser.selects.items()}
+
+    async def login(self, username, password):
+        await self.get_form("/login")
+        response = await self.client.post("/login", headers=self.headers("/login"),
+                                          data={"_token": self.csrf_token, "email": username, "password": password})
+        if response.status_code not in (302, 303) or response.headers.get("location", "").rstrip("/").endswith("/login"):
+            raise PermissionError(f"login failed with status {response.status_code}")
+
+    async def listing_rows(self, path):
+        """Read every page of a listing table and return the cell texts of each row."""
+        rows, seen, page_number = [], set(), 1
+        while True:
+            response = await self.client.get(path, params={"page": page_number}, headers=self.headers())
+            response.raise_for_status()
+            parser = TableParser()
+            parser.feed(response.text)
+            new_rows = [cells for cells in parser.rows if tuple(cells) not in seen]
+            if not new_rows:
+                return rows
+            seen.update(tuple(cells) for cells in new_rows)
+            rows.extend(new_rows)
+            page_number += 1
+
+    async def import_file(self, path, file_path):
+        """Upload an import file in one request and return the portal's JSON summary, or None if it has no import page."""
+        try:
+            await self.get_form(path)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return None
+            raise
+        with open(file_path, "rb") as import_file:
+            content = import_file.read()
+        response = await self.client.post(path, headers=dict(self.headers(path), Accept="application/json"),
+                                          data={"_token": self.csrf_token},
+                                          files={"file": (os.path.basename(file_path), content, "text/csv")})
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def submit(self, path, form, options):
+        """Post a create form. Select fields given by label are resolved to their option values, ignoring case and spacing.
+
+        Returns (ok, detail). Laravel redirects back to the create page when validation fails.
+        """
+        data = {"_token": self.csrf_token}
+        for field, value in form.items():
+            data[field] = options[field].resolve(value) or value if field in options else value
+        async with self.semaphore:
+            with instrumentation.span("http_submit"):
+                response = await self.client.post(path, headers=self.headers(f"{path}/create"), data=data)
+        location = response.headers.get("location", "")
+        if response.status_code in (302, 303) and not location.rstrip("/").endswith("/create"):
+            return True, location
+        if response.status_code == 419:
+            return False, "CSRF token expired"
+        if location.rstrip("/").endswith("/create"):
+            return False, "validation failed"
+        return False, f"status {response.status_code} {location}".strip()
+
+
+async def submit_rows(username, password, path, rows, build_form, concurrency=4, base_url=BASE_URL,
+                      existing_key=None, existing_columns=(0,), on_result=None):
+    """Create one portal entity per row over HTTP and return the rows that failed, for the browser fallback.
+
+    existing_key(row) gives the values that identify a row in the portal listing, found in its
+    existing_columns; rows already listed are skipped. on_result(row, status, detail) is called with "exists", "done" or "failed" for every row.
+    """
+    on_result = on_result or (lambda row, status, detail="": None)
+    async with PortalHttpClient(base_url, concurrency) as client:
+        await client.login(username, password)
+        if existing_key is not None:
+            listing = ListingIndex(await client.listing_rows(path), existing_columns)
+            new_rows = []
+            for row in rows:
+                if listing.contains(*existing_key(row)):
+                    on_result(row, "exists")
+                    instrumentation.count("rows_existing")
+                else:
+                    new_rows.append(row)
+            rows = new_rows
+        options = await client.get_form(f"{path}/create")
+        results = await asyncio.gather(*(client.submit(path, build_form(row), options) for row in rows),
+                                       return_exceptions=True)
+    failed = []
+    for row, result in zip(rows, results):
+        if isinstance(result, Exception) or not result[0]:
+            detail = result if isinstance(result, Exception) else result[1]
+            print("Error:", detail, row)
+            on_result(row, "failed", detail)
+            instrumentation.count("rows_failed")
+            failed.append(row)
+        else:
+            on_result(row, "done")
+            instrumentation.count("rows_uploaded")
+    return failed
@@ -0,0 +1,350 @@
+import argparse
+import csv
+import html
+import io
+import json
+import secrets
+import threading
+from email import policy
+from email.parser import BytesParser
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STATUS_OPTIONS = {"Active": "1", "Inactive": "0"}
+REQUIRED_OPTIONS = {"Yes": "1", "No": "0"}
+
+
+class PortalState:
+    """In-memory vendor portal data: users, sessions, addon categories, addons, items and item-addon links."""
+
+    def __init__(self, users=None, per_page=10):
+        self.users = users or {"vendor@example.com": "secret"}
+        self.per_page = per_page
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, items=()):
+        """Drop all portal data and seed the catalog with items ({"category", "title", "price"} dicts)."""
+        with self.lock:
+            self.categories = []
+            self.addons = []
+            self.items = [dict(item, id=index + 1) for index, item in enumerate(items)]
+            self.links = set()
+
+    def category_options(self):
+        return {category["name"]: str(category["id"]) for category in self.categories}
+
+    def import_rows(self, rows):
+        """Apply import file rows with the create forms' checks; returns created counts and per-line errors."""
+        created = {"category": 0, "addon": 0, "link": 0}
+        errors = []
+        with self.lock:
+            items = {(item["category"], item["title"]): item for item in self.items}
+            categories = self.category_options()
+            addons = {(addon["addon_category_id"], addon["name"]): addon for addon in self.addons}
+            for line, row in enumerate(rows, start=2):
+                record = row.get("record")
+                if record == "category":
+                    required = REQUIRED_OPTIONS.get(row.get("required"))
+                    if not row.get("category") or required is None or (required == "0" and not row.get("count", "").isdigit()):
+                        errors.append({"line": line, "error": "invalid category"})
+                        continue
+                    self.categories.append({"id": len(self.categories) + 1, "name": row["category"], "status": "1",
+                                            "is_required": required, "count": row.get("count") or None})
+                    categories[row["category"]] = str(len(self.categories))
+                elif record == "addon":
+                    category_id = categories.get(row.get("category"))
+                    try:
+                        float(row.get("price", ""))
+                        valid = row.get("addon") and category_id is not None
+                    except ValueError:
+                        valid = False
+                    if not valid:
+                        errors.append({"line": line, "error": "invalid addon"})
+                        continue
+                    addon = {"id": len(self.addons) + 1, "name": row["addon"], "price": row["price"],
+                             "addon_category_id": category_id, "status": "1"}
+                    self.addons.append(addon)
+                    addons[(category_id, row["addon"])] = addon
+                elif record == "link":
+                    item = items.get((row.get("item_category"), row.get("item")))
+                    addon = addons.get((categories.get(row.get("category")), row.get("addon")))
+                    if item is None or addon is None:
+                        errors.append({"line": line, "error": "unknown item or addon"})
+                        continue
+                    self.links.add((str(item["id"]), str(addon["id"])))
+                else:
+                    errors.append({"line": line, "error": f"unknown record '{record}'"})
+                    continue
+                created[record] += 1
+        return created, errors
+
+
+def display_price(price):
+    """Prices as the portal lists them: numbers without a trailing .0."""
+    try:
+        number = float(price)
+    except (TypeError, ValueError):
+        return str(price)
+    return str(int(number)) if number.is_integer() else str(number)
+
+
+SEARCH_SCRIPT = """
+document.getElementById('search').addEventListener('input', (event) => {
+    document.documentElement.classList.add('nprogress-busy');
+    fetch('/items?partial=1&search=' + encodeURIComponent(event.target.value))
+        .then((response) => response.text())
+        .then((rows) => {
+            document.querySelector('table.w-full.whitespace-nowrap').innerHTML = rows;
+            document.documentElement.classList.remove('nprogress-busy');
+        });
+});
+"""
+
+
+def select_html(select_id, options):
+    rendered = "".join(f'<option value="{html.escape(value)}">{html.escape(label)}</option>' for label, value in options.items())
+    return f'<select id="{select_id}" name="{select_id}">{rendered}</select>'
+
+
+class PortalRequestHandler(BaseHTTPRequestHandler):
+    """Reproduces the portal's login and create-form endpoints, including Laravel's redirect conventions."""
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def session(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        session_id = cookie["laravel_session"].value if "laravel_session" in cookie else None
+        return session_id, self.state.sessions.get(session_id)
+
+    def send_page(self, body, cookies=()):
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for cookie in cookies:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def redirect(self, location, status=302):
+        self.send_response(status)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def back(self):
+        """Redirect to the page the request came from, as Laravel's back() does after a validation error."""
+        self.redirect(self.headers.get("Referer") or "/")
+
+    def send_json(self, data):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_form(self):
+        """Form fields from a urlencoded or multipart body; an uploaded file's field holds its text."""
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            message = BytesParser(policy=policy.HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+            return {part.get_param("name", header="content-disposition"): part.get_content() for part in message.iter_parts()}
+        return {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+
+    def base_url(self):
+        return f"http://{self.headers.get('Host')}"
+
+    def form_page(self, session, fields, action=""):
+        return (f'<html><head><meta name="csrf-token" content="{session["token"]}"></head><body>'
+                f'<div class="max-w-3xl overflow-hidden bg-white rounded shadow"><form method="post" action="{action}">'
+                f'<input type="hidden" name="_token" value="{session["token"]}">{fields}{self.form_error(session)}'
+                f'<button type="submit">Save</button></form></div></body></html>')
+
+    @staticmethod
+    def form_error(session):
+        """The validation message flashed by the last rejected submit, shown once like Laravel's session errors."""
+        error = session.pop("error", None)
+        return f'<div class="form-error">{html.escape(error)}</div>' if error else ""
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        session_id, session = self.session()
+        if path == "/login" and session is not None and session["user"] is not None:
+            self.redirect("/")
+        elif path == "/login":
+            if session is None:
+                session_id = secrets.token_hex(16)
+                session = {"token": secrets.token_hex(20), "user": None}
+                with self.state.lock:
+                    self.state.sessions[session_id] = session
+            self.send_page(self.form_page(session, '<input id="email" name="email"><input type="password" name="password">'),
+                           cookies=[f"laravel_session={session_id}; Path=/", f"XSRF-TOKEN={session['token']}; Path=/"])
+        elif session is None or session["user"] is None:
+            self.redirect("/login")
+        elif path == "/addoncategories/create":
+            self.send_page(self.form_page(session, '<input id="name" name="name">' + select_html("status", STATUS_OPTIONS)
+                                          + select_html("is_required", REQUIRED_OPTIONS) + '<input id="count" name="count">',
+                                          "/addoncategories"))
+        elif path == "/addons/create":
+            self.send_page(self.form_page(session, '<input id="name" name="name"><input id="price" name="price">'
+                                          + select_html("addon_category_id", self.state.category_options())
+                                          + select_html("status", STATUS_OPTIONS), "/addons"))
+        elif path in ("/addoncategories", "/addons"):
+            self.send_page(self.listing_page(path))
+        elif path == "/import":
+            self.send_page(self.form_page(session, '<input type="file" id="file" name="file">', "/import"))
+        elif path == "/items":
+            self.send_page(self.items_page())
+        elif path.startswith("/items/"):
+            self.send_page(self.item_page(path.rsplit("/", 1)[1]))
+        elif path.startswith("/addaddon/"):
+            _, _, item_id, addon_id = path.split("/")
+            with self.state.lock:
+                self.state.links.add((item_id, addon_id))
+            self.redirect(f"/items/{item_id}")
+        else:
+            self.send_page("<html><body>ok</body></html>")
+
+    def page_rows(self, rows):
+        query = parse_qs(urlparse(self.path).query)
+        page_number = int(query.get("page", ["1"])[0])
+        return rows[(page_number - 1) * self.state.per_page:page_number * self.state.per_page]
+
+    def listing_page(self, path):
+        if path == "/addoncategories":
+            rows = [[category["name"], category["status"], category["is_required"], category["count"] or ""]
+                    for category in self.state.categories]
+        else:
+            names = {str(category["id"]): category["name"] for category in self.state.categories}
+            rows = [[addon["name"], names.get(addon["addon_category_id"], ""), addon["price"]] for addon in self.state.addons]
+        body = "".join("<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + "</tr>"
+                       for row in self.page_rows(rows))
+        return (f'<html><body><a href="{self.base_url()}{path}/create">Create</a>'
+                f'<table class="w-full whitespace-nowrap">{body}</table></body></html>')
+
+    def items_page(self):
+        """The item catalog: paginated, or filtered by ?search= (just the rows when partial=1)."""
+        query = parse_qs(urlparse(self.path).query)
+        search = query.get("search", [None])[0]
+        if search is not None:
+            items = [item for item in self.state.items if search.lower() in item["title"].lower()]
+        else:
+            items = self.page_rows(self.state.items)
+        rows = "".join(
+            f'<tr class="hover:bg-gray-100 focus-within:bg-gray-100"><td>{html.escape(item["category"])}</td>'
+            f'<td>{html.escape(item["title"])}</td><td>{html.escape(display_price(item["price"]))}</td>'
+            f'<td><a href="{self.base_url()}/items/{item["id"]}">Edit</a></td></tr>'
+            for item in items)
+        if "partial" in query:
+            return rows
+        return (f'<html><body><input id="search" name="search"><table class="w-full whitespace-nowrap">{rows}</table>'
+                f'<script>{SEARCH_SCRIPT}</script></body></html>')
+
+    def item_page(self, item_id):
+        """An item's addon table: every portal addon with a link that attaches it to the item."""
+        categories = {str(category["id"]): category for category in self.state.categories}
+        rows = []
+        for addon in self.state.addons:
+            category = categories.get(addon["addon_category_id"], {})
+            required = "Yes" if category.get("is_required") == "1" else "No"
+            linked = "linked" if (item_id, str(addon["id"])) in self.state.links else ""
+            rows.append(
+                f'<tr class="hover:bg-gray-100"><td>{addon["id"]}</td><td>{html.escape(category.get("name", ""))}</td>'
+                f'<td>{required}</td><td>{html.escape(addon["name"])}</td><td>{html.escape(display_price(addon["price"]))}</td>'
+                f'<td><a href="{self.base_url()}/addaddon/{item_id}/{addon["id"]}">Add</a> {linked}</td></tr>')
+        return f'<html><body><table class="w-full whitespace-nowrap">{"".join(rows)}</table></body></html>'
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        _, session = self.session()
+        form = self.read_form()
+        if session is None or form.get("_token") != session["token"]:
+            self.send_response(419)
+            self.end_headers()
+            return
+        if path == "/login":
+            if self.state.users.get(form.get("email")) == form.get("password"):
+                session["user"] = form["email"]
+                self.redirect("/")
+            else:
+                self.back()
+        elif session["user"] is None:
+            self.redirect("/login")
+        elif path == "/addoncategories":
+            valid = (form.get("name") and form.get("status") in STATUS_OPTIONS.values()
+                     and form.get("is_required") in REQUIRED_OPTIONS.values()
+                     and (form.get("is_required") == "1" or form.get("count", "").isdigit()))
+            if not valid:
+                session["error"] = "The given data was invalid."
+                self.back()
+                return
+            with self.state.lock:
+                self.state.categories.append({"id": len(self.state.categories) + 1, "name": form["name"], "status": form["status"],
+                                              "is_required": form["is_required"], "count": form.get("count")})
+            self.redirect("/addoncategories")
+        elif path == "/import":
+            created, errors = self.state.import_rows(list(csv.DictReader(io.StringIO(form.get("file", "")))))
+            self.send_json({"created": created, "errors": errors})
+        elif path == "/addons":
+            try:
+                float(form.get("price", ""))
+                valid = form.get("name") and form.get("addon_category_id") in self.state.category_options().values()
+            except ValueError:
+                valid = False
+            if not valid:
+                session["error"] = "The given data was invalid."
+                self.back()
+                return
+            with self.state.lock:
+                self.state.addons.append({"id": len(self.state.addons) + 1, "name": form["name"], "price": form["price"],
+                                          "addon_category_id": form["addon_category_id"], "status": form.get("status")})
+            self.redirect("/addons")
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded server with room for many concurrent connects; past the default backlog of 5 they stall a second."""
+
+    request_queue_size = 128
+
+
+class PortalStub:
+    """Local stand-in for the vendor portal, served from a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=0, state=None):
+        self.state = state or PortalState()
+        handler = type("BoundPortalRequestHandler", (PortalRequestHandler,), {"state": self.state})
+        self.server = StubServer((host, port), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stub of the vendor portal form endpoints.")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    stub = PortalStub(port=args.port)
+    print(f"Portal stub listening on {stub.base_url}")
+    stub.server.serve_forever()
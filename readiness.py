@@ -0,0 +1,227 @@
+import contextvars
+import inspect
+import json
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+_metrics_scope = contextvars.ContextVar("metrics_scope", default=None)
+
+
+def current_scope():
+    """The scope (see metrics_scope) that metrics recorded now also go to, or None."""
+    return _metrics_scope.get()
+
+
+@contextmanager
+def metrics_scope(name):
+    """Record the waits, spans, counters and network traffic inside under name as well as in the run totals.
+
+    Vendors of a batch run at the same time on the shared singletons; each one runs in its own scope,
+    and the report methods print the current scope's numbers, so a vendor's report is just its own.
+    Threads started inside need contextvars.copy_context() to stay in the scope.
+    """
+    token = _metrics_scope.set(name)
+    try:
+        yield
+    finally:
+        _metrics_scope.reset(token)
+
+# Polled by wait_for_function: true once the element's markup has stayed the same for quietMs.
+SETTLED_SCRIPT = """([selector, quietMs]) => {
+    const element = document.querySelector(selector);
+    if (!element) return false;
+    const size = element.innerHTML.length, now = performance.now(), last = window.__settled;
+    if (!last || last.element !== element || last.size !== size) {
+        window.__settled = {element, size, since: now};
+        return false;
+    }
+    return now - last.since >= quietMs;
+}"""
+
+
+class LatencyHistogram:
+    """Bucketed latency counts for one named wait, plus a window of recent successful samples for percentiles."""
+    BUCKETS_MS = (50, 100, 250, 500, 1000, 2000, 5000, 10000, 30000)
+
+    def __init__(self, window=200):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.recent = deque(maxlen=window)
+        self.failures = 0
+
+    def record(self, elapsed_ms, ok=True):
+        if ok:
+            self.recent.append(elapsed_ms)
+        else:
+            self.failures += 1
+        for index, bound in enumerate(self.BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def percentile(self, q):
+        if not self.recent:
+            return None
+        samples = sorted(self.recent)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def as_dict(self):
+        labels = [f"<={bound}ms" for bound in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        return {
+            'count': sum(self.counts),
+            'failures': self.failures,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': max(self.recent) if self.recent else None,
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class Readiness:
+    """Event-driven waits with adaptive timeouts and per-wait latency histograms.
+
+    Every wait works on sync and async Playwright pages: on an async page the call returns an
+    awaitable, so ``await readiness.wait_for_selector(page, ...)`` is all an async caller changes.
+    Once a wait has ``min_samples`` successful samples its timeout shrinks to ``headroom`` times its
+    recent p95 (never below ``min_timeout``), so a page that is not going to load fails fast.
+    """
+
+    def __init__(self, min_timeout=2000, headroom=4.0, min_samples=20):
+        self.min_timeout = min_timeout
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.histograms = {}
+        self.scopes = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, name):
+        return self.histograms.setdefault(name, LatencyHistogram())
+
+    def timeout_for(self, name, default):
+        """Return the adaptive timeout for a named wait, falling back to default until it has enough samples."""
+        histogram = self.histograms.get(name)
+        if histogram is None or len(histogram.recent) < self.min_samples:
+            return default
+        return min(default, max(self.min_timeout, histogram.percentile(0.95) * self.headroom))
+
+    def _record(self, name, start, ok=True):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        scope = current_scope()
+        with self.lock:
+            self.histogram(name).record(elapsed_ms, ok)
+            if scope is not None:
+                self.scopes.setdefault(scope, {}).setdefault(name, LatencyHistogram()).record(elapsed_ms, ok)
+
+    def timed(self, name, call, optional=False):
+        """Run call() and record how long it took under name; optional waits swallow their timeout."""
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception:
+            self._record(name, start, ok=False)
+            if optional:
+                return None
+            raise
+        if inspect.isawaitable(result):
+            return self._timed_async(name, start, result, optional)
+        self._record(name, start)
+        return result
+
+    async def _timed_async(self, name, start, awaitable, optional):
+        try:
+            result = await awaitable
+        except Exception:
+            self._record(name, start, ok=False)
+            if optional:
+                return None
+            raise
+        self._record(name, start)
+        return result
+
+    def wait_for_selector(self, page, selector, name=None, state="visible", timeout=30000):
+        """Wait until selector reaches state."""
+        name = name or selector
+        return self.timed(name, lambda: page.wait_for_selector(
+            selector, state=state, timeout=self.timeout_for(name, timeout)))
+
+    def wait_for_network_idle(self, page, name="network_idle", timeout=5000):
+        """Wait for the network to go quiet; pages with background polling just run out the timeout."""
+        return self.timed(name, lambda: page.wait_for_load_state(
+            "networkidle", timeout=self.timeout_for(name, timeout)), optional=True)
+
+    def wait_for_settled(self, page, selector, name, quiet_ms=150, timeout=10000):
+        """Wait until the element at selector exists and its markup has not changed for quiet_ms.
+
+        Content that keeps changing (a ticking timer) just runs out the timeout.
+        """
+        return self.timed(name, lambda: page.wait_for_function(
+            SETTLED_SCRIPT, arg=[selector, quiet_ms], timeout=self.timeout_for(name, timeout)), optional=True)
+
+    def wait_for_nprogress(self, page, name="nprogress", timeout=3000, done_timeout=15000):
+        """Wait for an nprogress-driven request to start and finish (sync pages only).
+
+        The bar may already be gone by the time we look, so neither wait is an error. Returns False
+        when the busy state was never seen, since the page may then still show the previous results.
+        """
+        started = self.timed(f"{name}_start", lambda: page.wait_for_function(
+            "document.documentElement.classList.contains('nprogress-busy')",
+            timeout=self.timeout_for(f"{name}_start", timeout)), optional=True)
+        self.timed(name, lambda: page.wait_for_function(
+            "!document.documentElement.classList.contains('nprogress-busy')",
+            timeout=self.timeout_for(name, done_timeout)), optional=True)
+        return started is not None
+
+    def click_for_response(self, page, target, url_pattern, name, timeout=5000):
+        """Click target and wait for the response it loads from a URL matching url_pattern.
+
+        A click that loads nothing (an item without choices) is recorded as a failed wait, not raised.
+        """
+        pattern = re.compile(url_pattern)
+        wait_timeout = self.timeout_for(name, timeout)
+        if inspect.iscoroutinefunction(target.click):
+            return self._click_for_response_async(page, target, pattern, name, wait_timeout)
+        start = time.perf_counter()
+        try:
+            with page.expect_response(lambda response: bool(pattern.search(response.url)), timeout=wait_timeout):
+                target.click()
+        except Exception as e:
+            return self._missed_response(name, start, e)
+        self._record(name, start)
+        return True
+
+    async def _click_for_response_async(self, page, target, pattern, name, wait_timeout):
+        start = time.perf_counter()
+        try:
+            async with page.expect_response(lambda response: bool(pattern.search(response.url)), timeout=wait_timeout):
+                await target.click()
+        except Exception as e:
+            return self._missed_response(name, start, e)
+        self._record(name, start)
+        return True
+
+    def _missed_response(self, name, start, error):
+        self._record(name, start, ok=False)
+        if type(error).__name__ != "TimeoutError":
+            raise error
+        return False
+
+    def report(self, scope=None):
+        """Latency stats per wait, for the whole run or for one scope."""
+        with self.lock:
+            histograms = self.histograms if scope is None else dict(self.scopes.get(scope, {}))
+            return {name: histogram.as_dict() for name, histogram in sorted(histograms.items())}
+
+    def print_report(self):
+        for name, stats in self.report(current_scope()).items():
+            print(f"[wait] {name}: n={stats['count']} failed={stats['failures']} "
+                  f"p50={stats['p50_ms'] or 0:.0f}ms p95={stats['p95_ms'] or 0:.0f}ms")
+
+    def save_report(self, path):
+        with open(path, "w", encoding="utf-8") as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+
+readiness = Readiness()
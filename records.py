@@ -0,0 +1,57 @@
+import sys
+from collections import namedtuple
+
+
+class Record:
+    """Dict-style reads for the scraped row tuples, so the Excel writer, snapshot and uploaders read them like dicts.
+
+    Rows are namedtuples without a per-instance __dict__, and make() interns their strings, so the same
+    category, addon or status text repeated across thousands of rows is stored once.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def make(cls, *values):
+        return cls(*(sys.intern(value) if isinstance(value, str) else value for value in values))
+
+    @classmethod
+    def from_row(cls, row):
+        """Build the record from a dict row, such as one loaded from a menu snapshot."""
+        return cls.make(*(row.get(field) for field in cls._fields))
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+
+class CategoryRow(Record, namedtuple("CategoryRow", ["addon_category", "category_status", "addon_count_line"])):
+    __slots__ = ()
+
+
+class AddonRow(Record, namedtuple("AddonRow", ["addon_category", "addon_name", "addon_price", "category_status"])):
+    __slots__ = ()
+
+
+class ItemAddonRow(Record, namedtuple("ItemAddonRow", ["category_name", "item_name", "addon_category", "addon_name",
+                                                       "addon_price", "category_status"])):
+    __slots__ = ()
+
+
+class DeliverooItemAddonRow(Record, namedtuple("DeliverooItemAddonRow", ["item_name", "addon_name", "addon_price",
+                                                                         "category_status"])):
+    __slots__ = ()
@@ -0,0 +1,157 @@
+import asyncio
+import random
+import time
+from credentials import retry_attempts, retry_base_delay
+from instrumentation import instrumentation
+from readiness import readiness
+
+TIMEOUT = "timeout"
+SELECTOR_MISSING = "selector_missing"
+LOGGED_OUT = "logged_out"
+VALIDATION = "validation"
+UNKNOWN = "unknown"
+
+FORM_ERROR_SELECTOR = ".form-error"
+SELECTOR_HINTS = ("waiting for selector", "waiting for locator", "No node found", "not attached", "NoneType")
+
+
+class ValidationError(Exception):
+    """The portal rejected a submitted form; sending the same row again will not help."""
+
+
+class SubmitUnconfirmed(Exception):
+    """The form was submitted but its outcome never showed, so the portal may already have the row."""
+
+
+class RowFailed(Exception):
+    """A row that still failed after every retry, with the kind of its last error.
+
+    unconfirmed is set when a submit may have created the row and no listing check has ruled it out.
+    """
+
+    def __init__(self, kind, error, unconfirmed=False):
+        super().__init__(f"{kind}: {error}")
+        self.kind = kind
+        self.error = error
+        self.unconfirmed = unconfirmed
+
+
+def classify(error, page_url=""):
+    """Sort an error into timeout, selector_missing, logged_out, validation or unknown.
+
+    A page that ended up on the login screen means the session is gone, whatever the error said.
+    """
+    if isinstance(error, ValidationError):
+        return VALIDATION
+    if "/login" in (page_url or ""):
+        return LOGGED_OUT
+    message = str(error)
+    if type(error).__name__ == "TimeoutError" or "Timeout" in message:
+        return TIMEOUT
+    if isinstance(error, AttributeError) or any(hint in message for hint in SELECTOR_HINTS):
+        return SELECTOR_MISSING
+    return UNKNOWN
+
+
+class Recovery:
+    """Retry one row's portal steps in place of reloading the page and dropping the row.
+
+    Timeouts and missing selectors back off with full jitter before ``reset(page)`` puts the page
+    back where the row starts; a lost session calls ``login(page)`` instead of waiting. Validation
+    errors are not retried. After SubmitUnconfirmed the row is only sent again once ``confirm(page)``
+    finds it missing from the portal; without ``confirm`` it fails rather than risk a duplicate. A
+    ``login`` or ``reset`` that fails counts as a failed attempt. ``run`` is for sync pages and
+    ``run_async`` for async ones, whose ``call``, ``login``, ``reset`` and ``confirm`` return awaitables.
+    """
+
+    def __init__(self, attempts=retry_attempts, base_delay=retry_base_delay, max_delay=8.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _failed(self, error, page, attempt, unconfirmed=False, can_resend=True):
+        """Classify a failed attempt and return its kind, raising RowFailed when the row should give up."""
+        kind = classify(error, page.url)
+        instrumentation.count(f"errors_{kind}")
+        if kind == VALIDATION or attempt == self.attempts - 1 or not can_resend:
+            raise RowFailed(kind, error, unconfirmed) from error
+        print(f"[Retry] {kind} on attempt {attempt + 1}/{self.attempts}: {str(error).splitlines()[0]}")
+        return kind
+
+    def run(self, call, page, login, reset, confirm=None):
+        kind, unconfirmed = None, False
+        for attempt in range(self.attempts):
+            try:
+                if kind == LOGGED_OUT:
+                    instrumentation.count("relogins")
+                    login(page)
+                elif kind is not None:
+                    time.sleep(self.backoff(attempt - 1))
+                if unconfirmed and confirm(page):
+                    instrumentation.count("submits_confirmed")
+                    return None
+                unconfirmed = False
+                if kind is not None:
+                    reset(page)
+                return call()
+            except Exception as e:
+                unconfirmed = unconfirmed or isinstance(e, SubmitUnconfirmed)
+                kind = self._failed(e, page, attempt, unconfirmed, confirm is not None or not unconfirmed)
+
+    async def created_after(self, failed, confirm):
+        """Whether a RowFailed row was created anyway: False when sending it again is safe, None when that is unknown.
+
+        Only an unconfirmed row needs the ``confirm()`` listing check; one the check cannot settle must not be resent.
+        """
+        if not failed.unconfirmed:
+            return False
+        try:
+            created = await confirm()
+        except Exception as e:
+            print(f"[Retry] could not check the listing for an unconfirmed submit: {str(e).splitlines()[0]}")
+            return None
+        if created:
+            instrumentation.count("submits_confirmed")
+        return created
+
+    async def run_async(self, call, page, login, reset, confirm=None):
+        kind, unconfirmed = None, False
+        for attempt in range(self.attempts):
+            try:
+                if kind == LOGGED_OUT:
+                    instrumentation.count("relogins")
+                    await login(page)
+                elif kind is not None:
+                    await asyncio.sleep(self.backoff(attempt - 1))
+                if unconfirmed and await confirm(page):
+                    instrumentation.count("submits_confirmed")
+                    return None
+                unconfirmed = False
+                if kind is not None:
+                    await reset(page)
+                return await call()
+            except Exception as e:
+                unconfirmed = unconfirmed or isinstance(e, SubmitUnconfirmed)
+                kind = self._failed(e, page, attempt, unconfirmed, confirm is not None or not unconfirmed)
+
+
+async def wait_for_submit(page, table_selector):
+    """Wait for a create form's redirect back to the listing, raising ValidationError if the form comes back instead.
+
+    Any other failure raises SubmitUnconfirmed, since the portal may have created the row before it.
+    """
+    try:
+        await readiness.wait_for_selector(page, f"{table_selector}, {FORM_ERROR_SELECTOR}", name="submit")
+    except Exception as e:
+        if page.url.rstrip("/").endswith("/create"):
+            raise ValidationError(f"the portal kept the form open at {page.url}")
+        raise SubmitUnconfirmed(e) from e
+    form_error = await page.query_selector(FORM_ERROR_SELECTOR)
+    if form_error:
+        raise ValidationError((await form_error.text_content()).strip())
+
+
+recovery = Recovery()
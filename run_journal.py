@@ -0,0 +1,76 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from credentials import journal_run_id
+
+DONE_STATUSES = ("done", "exists")
+SCHEMA = ("CREATE TABLE IF NOT EXISTS journal ("
+          "run TEXT, row_key TEXT, status TEXT, detail TEXT, updated_at REAL, PRIMARY KEY (run, row_key))")
+
+
+class RunJournal:
+    """SQLite checkpoint journal recording each spreadsheet row's outcome, so a rerun only does what is left.
+
+    Rows are recorded under run_name and run_id. A new run_id (journal_run_id in credentials), for a portal
+    that was wiped or re-seeded, starts from scratch without deleting the earlier runs' rows.
+    """
+
+    def __init__(self, path, run_name, run_id=journal_run_id):
+        self.run_name = f"{run_name}@{run_id}" if run_id else run_name
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+        self.done = {key for key, in self.connection.execute(
+            f"SELECT row_key FROM journal WHERE run = ? AND status IN ({','.join('?' * len(DONE_STATUSES))})",
+            (self.run_name, *DONE_STATUSES))}
+
+    @staticmethod
+    def row_key(row):
+        """Stable key for a spreadsheet row (a dict) or an item name."""
+        if isinstance(row, dict):
+            return json.dumps([str(value) for value in row.values()], ensure_ascii=False)
+        return str(row)
+
+    def is_done(self, row):
+        return self.row_key(row) in self.done
+
+    def pending(self, rows):
+        """Return the rows that have not completed in an earlier run."""
+        pending = [row for row in rows if not self.is_done(row)]
+        skipped = len(rows) - len(pending)
+        if skipped:
+            print(f"[Journal] skipping {skipped} rows completed in an earlier run")
+        return pending
+
+    def record(self, row, status, detail=""):
+        key = self.row_key(row)
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO journal (run, row_key, status, detail, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (self.run_name, key, status, str(detail), time.time()))
+            self.connection.commit()
+            if status in DONE_STATUSES:
+                self.done.add(key)
+
+    def summary(self):
+        with self.lock:
+            return dict(self.connection.execute(
+                "SELECT status, COUNT(*) FROM journal WHERE run = ? GROUP BY status", (self.run_name,)))
+
+    def close(self):
+        self.connection.close()
+
+
+def clear_journal(path):
+    """Forget every recorded row in the journal at path, so the next run starts from scratch."""
+    if not os.path.exists(path):
+        return
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute(SCHEMA)
+        connection.execute("DELETE FROM journal")
+    connection.close()
+    print(f"[Journal] cleared {path}")
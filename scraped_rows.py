@@ -0,0 +1,100 @@
+import os
+from excel_writer import ExcelSpill, append_rows_to_excel
+from instrumentation import instrumentation
+from readiness import readiness
+from browser_profile import network_metrics
+from menu_snapshot import ROW_KINDS
+
+
+class ScrapedRows:
+    """Row storage, snapshot bookkeeping, flushing and Excel export shared by the addon scrapers.
+
+    A scraper sets base_path, the three dedup stores (cat_attributes, addon_attributes,
+    items_addons_attributes), snapshot, on_records, export_excel, flush_rows, items_done, items_failed
+    and spills in its __init__, and implements run_engine to scrape the menu.
+    """
+
+    def append_to_excel(self, filename, rows):
+        """Append rows to an Excel file in a single pass, creating headers if file does not exist."""
+        append_rows_to_excel(os.path.join(self.base_path, filename), rows)
+
+    def previous_records(self, section_name, card_text):
+        """Return (item_key, rows) for an item card, with rows from the last snapshot if the card is unchanged."""
+        if self.snapshot is None:
+            return None, None
+        item_key = self.snapshot.item_key(section_name, card_text)
+        return item_key, self.snapshot.previous_rows(item_key)
+
+    def keep_records(self, item_key, records, section_name):
+        if self.snapshot is not None:
+            self.snapshot.keep(item_key, records, section_name)
+
+    def merge_records(self, records):
+        """Add (category, addon, item-addon) row lists to the dedup stores in their original order.
+
+        The rows that were new to the stores are passed to on_records, which is how the streaming pipeline
+        receives them while the scrape goes on.
+        """
+        new_records = tuple([row for row in rows if store.add(row)] for store, rows in zip(self.stores(), records))
+        if self.on_records is not None and any(new_records):
+            self.on_records(new_records)
+        if self.flush_rows and sum(len(store) for store in self.stores()) >= self.flush_rows:
+            self.flush()
+
+    def stores(self):
+        return [self.cat_attributes, self.addon_attributes, self.items_addons_attributes]
+
+    def export_rows(self, rows=None):
+        """(filename, rows) for each Excel file, keeping only rows new since the snapshot when there is one."""
+        for data, filename, kind in zip(rows or self.stores(), ["addon_cat.xlsx", "addons.xlsx", "items_addons.xlsx"], ROW_KINDS):
+            if self.snapshot is not None:
+                data = [row for row in data if self.snapshot.is_new(kind, row)]
+            yield filename, data
+
+    def save_to_excel(self, rows=None):
+        """Save scraped data (or the given per-store row lists) to Excel files."""
+        for filename, data in self.export_rows(rows):
+            self.append_to_excel(filename, data)
+
+    def flush(self):
+        """Spill the rows scraped since the last flush (when exporting) and drop them from memory.
+
+        The spills reach the Excel files in save_spills, once the scrape is over.
+        """
+        rows = [store.drain() for store in self.stores()]
+        if self.export_excel:
+            for filename, data in self.export_rows(rows):
+                if filename not in self.spills:
+                    self.spills[filename] = ExcelSpill(os.path.join(self.base_path, filename))
+                self.spills[filename].append(data)
+        instrumentation.count("rows_flushed", sum(len(store_rows) for store_rows in rows))
+
+    def save_spills(self):
+        for spill in self.spills.values():
+            spill.save()
+        self.spills = {}
+
+    def item_failed(self, error, section_name=None):
+        """Count a failed item; with a snapshot, its section's previous items are kept so the diff does not drop it."""
+        self.items_failed += 1
+        if self.snapshot is not None and section_name is not None:
+            self.snapshot.mark_failed(section_name)
+        instrumentation.count("items_failed")
+        print(f"Error processing item: {error}")
+
+    def start(self):
+        """Start the scraping process and return (items failed, items seen)."""
+        self.run_engine()
+        if self.flush_rows:
+            self.flush()
+            self.save_spills()
+        elif self.export_excel:
+            self.save_to_excel()
+        if self.snapshot is not None:
+            self.snapshot.save_diff()
+            self.snapshot.save()
+        print("Scraping and saving complete!")
+        readiness.print_report()
+        network_metrics.print_report()
+        instrumentation.finish()
+        return self.items_failed, self.items_failed + self.items_done
@@ -1,130 +1,309 @@
 from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+import asyncio
 import re
-import openpyxl
-from openpyxl.styles import Font
 import os
-from credentials import vendor_name, vendor_url
+from dedup_store import DedupStore
+from records import CategoryRow, AddonRow, ItemAddonRow
+from modal_extraction import read_modal
+from readiness import readiness
+from browser_pool import launch_browser
+from browser_profile import profile
+from instrumentation import instrumentation
+from menu_capture import MenuResponseCapture, TALABAT_URL_PATTERN, talabat_menu_items
+from menu_snapshot import MenuSnapshot, CARD_TEXT_SCRIPT
+from scraped_rows import ScrapedRows
+from credentials import vendor_name, vendor_url, scraper_workers, scraper_engine, scraper_incremental, scraper_flush_rows
 
-class TalabatAddonScraper:
-    def __init__(self, url, base_path):
+class TalabatAddonScraper(ScrapedRows):
+    CATEGORY_SELECTOR = "div[data-testid='menu-category']"
+    ITEM_SELECTORS = ["div.sc-a31f9fb2-0.dyJtfK.d-flex.justify-content-between.py-2.clickable",
+                      "div.sc-a31f9fb2-0.eQGrrN.d-flex.justify-content-between.py-2.clickable"]
+    MODAL_SPEC = {
+        'window': 'div.modal-content',
+        'category': "div.sc-1bf12ad-0.ilBSTs",
+        'name': "strong[data-test='sectionName']",
+        'marker': "div[data-testid='choices-checkboxes-component']",
+        'count': "span.dark-gray.align-middle",
+        'count_fallback': 'div.col-lg-5.col-md-5.col-sm-16.col-16',
+        'addon': 'div.col-lg-5.col-md-5.col-sm-16.col-16',
+        'addon_name': ['label.control-label > span:nth-of-type(2)', 'span.text span'],
+        'addon_price': ['label[data-testid="radio"] span.currency', 'label.control-label span.currency'],
+    }
+    MODAL_CLOSE_SELECTOR = "div.modal-content span.clickable.close-span"
+    NETWORK_URL_PATTERN = TALABAT_URL_PATTERN
+
+    def __init__(self, url, base_path, workers=1, engine='dom', snapshot_path=None, cdp_endpoint=None, on_records=None,
+                 export_excel=True, flush_rows=0):
         self.url = url
+        self.cdp_endpoint = cdp_endpoint
         self.base_path = base_path
-        self.cat_attributes = []
-        self.addon_attributes = []
-        self.items_addons_attributes = []
-
-    def append_to_excel(self, filename, data):
-        """Append data to an Excel file, creating headers if file does not exist."""
-        excel_path = f"{self.base_path}\\{filename}"
-        try:
-            workbook = openpyxl.load_workbook(excel_path)
-            sheet = workbook.active
-        except FileNotFoundError:
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            bold_font = Font(bold=True)
-            sheet.append(list(data.keys()))
-            for cell in sheet[1]:
-                cell.font = bold_font
-
-        sheet.append(list(data.values()))
-        workbook.save(excel_path)
-        
+        self.workers = workers
+        self.engine = engine
+        self.cat_attributes = DedupStore(['addon_category', 'category_status', 'addon_count_line'], CategoryRow)
+        self.addon_attributes = DedupStore(['addon_category', 'addon_name', 'addon_price', 'category_status'], AddonRow)
+        self.items_addons_attributes = DedupStore(['category_name', 'item_name', 'addon_category', 'addon_name', 'addon_price', 'category_status'], ItemAddonRow)
+        self.snapshot = MenuSnapshot(snapshot_path) if snapshot_path and engine != 'network' else None
+        self.on_records = on_records
+        self.export_excel = export_excel
+        self.flush_rows = flush_rows
+        self.items_done = 0
+        self.items_failed = 0
+        self.spills = {}
+
     def capitalize_sentence(self, sentence):
         return ' '.join(word.capitalize() for word in sentence.split())
 
 
-    def dict_exists(self, target_dict, data_list, keys):
-        """Check if a dictionary with specific keys exists in a list."""
-        return any(all(d.get(key) == target_dict.get(key) for key in keys) for d in data_list)
-
     def extract_addon_details(self, addon):
-        """Extract addon name and price from a given addon element."""
-        label = addon.query_selector('label.control-label > span:nth-of-type(2)')
-        text_span = addon.query_selector('span.text span')
-
-        addon_name = (label or text_span).text_content().split('(')[0].strip() if label or text_span else None
-        price_element = addon.query_selector('label[data-testid="radio"] span.currency') or \
-                        addon.query_selector('label.control-label span.currency')
-        addon_price = price_element.text_content().strip() if price_element else '0'
+        """Extract addon name and price from an addon read out of the modal."""
+        addon_name = addon['name'].split('(')[0].strip() if addon['name'] is not None else None
+        addon_price = addon['price'].strip() if addon['price'] is not None else '0'
 
         return addon_name, addon_price
 
+    def modal_rows(self, category_name, item_name, modal):
+        """Build (category, addon, item-addon) rows from a modal read with read_modal."""
+        if modal is None:
+            raise ValueError(f"addon modal did not open for '{item_name}'")
+        cat_rows, addon_rows, item_rows = [], [], []
+        for addon_category in modal:
+            category_status = "No" if addon_category['marked'] else "Yes"
+
+            addon_category_name = self.capitalize_sentence(addon_category['name'].strip())
+            count_text = addon_category['count_text'] or ''
+            addon_count = re.search(r'\d+', count_text).group() if re.search(r'\d+', count_text) else \
+                          addon_category['fallback_count']
+
+            cat_rows.append(CategoryRow.make(addon_category_name, category_status, addon_count))
+
+            for addon in addon_category['addons']:
+                addon_name, addon_price = self.extract_addon_details(addon)
+
+                item_rows.append(ItemAddonRow.make(category_name, item_name, addon_category_name, addon_name, addon_price, category_status))
+                addon_rows.append(AddonRow.make(addon_category_name, addon_name, addon_price, category_status))
+        return cat_rows, addon_rows, item_rows
+
     def extract_addon_categories(self, page, category, selector):
         """Extract all addon categories and their items from the menu."""
         category_name = category.query_selector('h4.f-20.f-500').inner_html().strip()
-        for item in category.query_selector_all(selector):
+        items = category.query_selector_all(selector)
+        card_texts = category.eval_on_selector_all(selector, CARD_TEXT_SCRIPT) if self.snapshot else [None] * len(items)
+        for item, card_text in zip(items, card_texts):
             try:
-                item_name = item.query_selector('div.f-15').text_content().strip()
-                item.click()
-                page.wait_for_timeout(2000)
-
-                addon_window = page.query_selector('div.modal-content')
-                addon_categories = addon_window.query_selector_all("div.sc-1bf12ad-0.ilBSTs")
-
-                for addon_category in addon_categories:
-                    has_checkboxes = addon_category.query_selector("div[data-testid='choices-checkboxes-component']")
-                    category_status = "No" if has_checkboxes else "Yes"
-                    
-                    addon_category_name = self.capitalize_sentence(addon_category.query_selector("strong[data-test='sectionName']").text_content().strip())
-                    count_text = addon_category.query_selector("span.dark-gray.align-middle").text_content()
-                    addon_count = re.search(r'\d+', count_text).group() if re.search(r'\d+', count_text) else \
-                                  len(addon_category.query_selector_all('div.col-lg-5.col-md-5.col-sm-16.col-16'))
-
-                    cat_data = {'addon_category': addon_category_name, 'category_status': category_status, 'addon_count_line': addon_count}
-                    if not self.dict_exists(cat_data, self.cat_attributes, cat_data.keys()):
-                        self.cat_attributes.append(cat_data)
-
-                    for addon in addon_category.query_selector_all('div.col-lg-5.col-md-5.col-sm-16.col-16'):
-                        addon_name, addon_price = self.extract_addon_details(addon)
-                        
-                        item_data = {'category_name': category_name,'item_name': item_name,'addon_category': addon_category_name, 'addon_name': addon_name, 'addon_price': addon_price, 'category_status': category_status,}
-                        if not self.dict_exists(item_data, self.items_addons_attributes, item_data.keys()):
-                            self.items_addons_attributes.append(item_data)
-
-                        addon_data = {'addon_category': addon_category_name, 'addon_name': addon_name, 'addon_price': addon_price, 'category_status': category_status}
-                        if not self.dict_exists(addon_data, self.addon_attributes, addon_data.keys()):
-                            self.addon_attributes.append(addon_data)
-
-                addon_window.query_selector("span.clickable.close-span").click()
+                item_key, records = self.previous_records(category_name, card_text)
+                if records is None:
+                    item_name = item.query_selector('div.f-15').text_content().strip()
+                    with instrumentation.span("modal_open"):
+                        readiness.click_for_response(page, item, self.NETWORK_URL_PATTERN, name="modal_choices")
+                        readiness.wait_for_selector(page, self.MODAL_SPEC['window'], name="modal_open")
+                        readiness.wait_for_settled(page, self.MODAL_SPEC['window'], name="modal_content")
+
+                    with instrumentation.span("modal_read"):
+                        modal = read_modal(page, self.MODAL_SPEC)
+                        records = self.modal_rows(category_name, item_name, modal)
+
+                    with instrumentation.span("modal_close"):
+                        page.click(self.MODAL_CLOSE_SELECTOR)
+                        readiness.wait_for_selector(page, self.MODAL_SPEC['window'], name="modal_close", state="hidden")
+                    instrumentation.count("items_scraped")
+                else:
+                    instrumentation.count("items_reused")
+                self.merge_records(records)
+                self.keep_records(item_key, records, category_name)
+                self.items_done += 1
             except Exception as e:
-                print(f"Error processing item: {e}")
+                self.item_failed(e, category_name)
+        for item in items:
+            item.dispose()
+
+    def category(self, page, index):
+        """The category section at index, skipping the menu header, as a handle the caller disposes."""
+        return page.query_selector(f"{self.CATEGORY_SELECTOR} >> nth={index + 1}")
+
+    def category_count(self, page):
+        return max(page.eval_on_selector_all(self.CATEGORY_SELECTOR, "els => els.length") - 1, 0)
+
+    async def category_count_async(self, page):
+        return max(await page.eval_on_selector_all(self.CATEGORY_SELECTOR, "els => els.length") - 1, 0)
 
     def scrape(self):
         """Scrape the menu from the given URL."""
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            page = browser.new_page()
-            page.goto(self.url)
+            browser = launch_browser(p, self.cdp_endpoint)
+            page = profile.new_context(browser).new_page()
+            instrumentation.goto(page, self.url)
+            readiness.wait_for_selector(page, self.CATEGORY_SELECTOR, name="menu_ready", state="attached")
+
+            # One category handle at a time, so a long menu does not keep every section's handle alive.
+            for index in range(self.category_count(page)):
+                category = self.category(page, index)
+                if category is None:
+                    print(f"Error processing category {index}: not rendered")
+                    continue
+                for selector in self.ITEM_SELECTORS:
+                    self.extract_addon_categories(page, category, selector)
+                category.dispose()
+
+            browser.close()
 
-            categories = page.query_selector_all("div[data-testid='menu-category']")[1:]
+    async def extract_addon_categories_async(self, page, category, selector, records):
+        """Async counterpart of extract_addon_categories that collects rows into records instead of the stores."""
+        category_name = (await (await category.query_selector('h4.f-20.f-500')).inner_html()).strip()
+        items = await category.query_selector_all(selector)
+        card_texts = await category.eval_on_selector_all(selector, CARD_TEXT_SCRIPT) if self.snapshot else [None] * len(items)
+        for item, card_text in zip(items, card_texts):
+            try:
+                item_key, item_records = self.previous_records(category_name, card_text)
+                if item_records is None:
+                    item_name = (await (await item.query_selector('div.f-15')).text_content()).strip()
+                    with instrumentation.span("modal_open"):
+                        await readiness.click_for_response(page, item, self.NETWORK_URL_PATTERN, name="modal_choices")
+                        await readiness.wait_for_selector(page, self.MODAL_SPEC['window'], name="modal_open")
+                        await readiness.wait_for_settled(page, self.MODAL_SPEC['window'], name="modal_content")
+
+                    with instrumentation.span("modal_read"):
+                        modal = await read_modal(page, self.MODAL_SPEC)
+                        item_records = self.modal_rows(category_name, item_name, modal)
+
+                    with instrumentation.span("modal_close"):
+                        await page.click(self.MODAL_CLOSE_SELECTOR)
+                        await readiness.wait_for_selector(page, self.MODAL_SPEC['window'], name="modal_close", state="hidden")
+                    instrumentation.count("items_scraped")
+                else:
+                    instrumentation.count("items_reused")
+                for rows, new_rows in zip(records, item_records):
+                    rows.extend(new_rows)
+                self.keep_records(item_key, item_records, category_name)
+                self.items_done += 1
+            except Exception as e:
+                self.item_failed(e, category_name)
+        for item in items:
+            await item.dispose()
+
+    async def scrape_category_worker(self, page, queue, results):
+        """Take category indexes off the queue and scrape them on this worker's page."""
+        while not queue.empty():
+            index = queue.get_nowait()
+            records = ([], [], [])
+            category = await self.category(page, index)
+            if category is None:
+                print(f"Error processing category {index}: not rendered on worker page")
+            else:
+                for selector in self.ITEM_SELECTORS:
+                    await self.extract_addon_categories_async(page, category, selector, records)
+                await category.dispose()
+            results[index] = records
+            self.merge_finished(results)
+
+    def merge_finished(self, results):
+        """Merge the finished categories that no earlier category is still waiting on, keeping menu order."""
+        while self.merged < len(results) and results[self.merged] is not None:
+            self.merge_records(results[self.merged])
+            self.merged += 1
+
+    async def scrape_async(self):
+        """Scrape the menu with a pool of self.workers pages sharing one browser, merging in category order."""
+        async with async_playwright() as p:
+            browser = await launch_browser(p, self.cdp_endpoint)
+            context = await profile.new_context_async(browser)
+            pages = [await context.new_page()]
+            await instrumentation.goto(pages[0], self.url)
+            await readiness.wait_for_selector(pages[0], self.CATEGORY_SELECTOR, name="menu_ready", state="attached")
+            category_count = await self.category_count_async(pages[0])
+
+            for _ in range(min(self.workers, category_count) - 1):
+                pages.append(await context.new_page())
+            await asyncio.gather(*(instrumentation.goto(page, self.url) for page in pages[1:]))
+            await asyncio.gather(*(readiness.wait_for_selector(page, self.CATEGORY_SELECTOR, name="menu_ready", state="attached")
+                                   for page in pages[1:]))
+
+            queue = asyncio.Queue()
+            for index in range(category_count):
+                queue.put_nowait(index)
+            results = [None] * category_count
+            self.merged = 0
+            await asyncio.gather(*(self.scrape_category_worker(page, queue, results) for page in pages))
 
-            for category in categories:
-                self.extract_addon_categories(page, category, 
-                                              "div.sc-a31f9fb2-0.dyJtfK.d-flex.justify-content-between.py-2.clickable")
-                self.extract_addon_categories(page, category, 
-                                              "div.sc-a31f9fb2-0.eQGrrN.d-flex.justify-content-between.py-2.clickable")
+            await browser.close()
 
+    def add_menu_items(self, menu_items):
+        """Add rows for menu items mapped from captured network payloads."""
+        for menu_item in menu_items:
+            if menu_item['has_choices'] and not menu_item['addon_categories']:
+                self.item_failed(f"no choices captured for '{menu_item['item_name']}'")
+                continue
+            self.items_done += 1
+            cat_rows, addon_rows, item_rows = [], [], []
+            for addon_category in menu_item['addon_categories']:
+                category_status = "Yes" if addon_category['required'] else "No"
+                addon_category_name = self.capitalize_sentence(addon_category['name'].strip())
+                cat_rows.append(CategoryRow.make(addon_category_name, category_status, str(addon_category['count'])))
+
+                for addon in addon_category['addons']:
+                    item_rows.append(ItemAddonRow.make(menu_item['category_name'], menu_item['item_name'], addon_category_name, addon['name'], addon['price'], category_status))
+                    addon_rows.append(AddonRow.make(addon_category_name, addon['name'], addon['price'], category_status))
+            self.merge_records((cat_rows, addon_rows, item_rows))
+
+    def exact_text(self, text):
+        return re.compile(rf"^\s*{re.escape(text)}\s*$")
+
+    def open_choices(self, page, capture, menu_item):
+        """Open an item card and capture the choices response it loads, tagged with the item's id."""
+        section = page.locator(self.CATEGORY_SELECTOR).filter(
+            has=page.locator('h4.f-20.f-500', has_text=self.exact_text(menu_item['category_name'])))
+        card = section.locator(", ".join(self.ITEM_SELECTORS)).filter(
+            has=page.locator('div.f-15', has_text=self.exact_text(menu_item['item_name']))).first
+        with instrumentation.span("modal_open"):
+            with page.expect_response(capture.wants) as response_info:
+                card.click()
+            capture.add_choices(menu_item['id'], response_info.value.json())
+        with instrumentation.span("modal_close"):
+            readiness.wait_for_selector(page, self.MODAL_SPEC['window'], name="modal_open")
+            page.click(self.MODAL_CLOSE_SELECTOR)
+            readiness.wait_for_selector(page, self.MODAL_SPEC['window'], name="modal_close", state="hidden")
+
+    def scrape_from_network(self):
+        """Scrape the menu from the JSON payloads the page loads.
+
+        Talabat embeds the menu in the page but only loads an item's choices when the item is opened, so
+        items with choices that no payload carried yet are opened one by one and their choices response
+        captured; their modals are never read.
+        """
+        capture = MenuResponseCapture(self.NETWORK_URL_PATTERN)
+        with sync_playwright() as p:
+            browser = launch_browser(p, self.cdp_endpoint)
+            page = profile.new_context(browser).new_page()
+            capture.attach(page)
+            instrumentation.goto(page, self.url, wait_until="networkidle")
+            capture.add_html(page.content())
+            for menu_item in talabat_menu_items(capture.payloads):
+                if not menu_item['has_choices'] or menu_item['addon_categories']:
+                    continue
+                try:
+                    self.open_choices(page, capture, menu_item)
+                except Exception as e:
+                    print(f"Error opening item '{menu_item['item_name']}': {e}")
             browser.close()
+        self.add_menu_items(talabat_menu_items(capture.payloads))
+
+    def run_engine(self):
+        if self.engine == 'network':
+            self.scrape_from_network()
+        elif self.workers > 1:
+            asyncio.run(self.scrape_async())
+        else:
+            self.scrape()
+
+if __name__ == "__main__":
+    desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
 
-    def save_to_excel(self):
-        """Save scraped data to Excel files."""
-        for data, filename in zip([self.cat_attributes, self.addon_attributes, self.items_addons_attributes],
-                                  ["addon_cat.xlsx", "addons.xlsx", "items_addons.xlsx"]):
-            for row in data:
-                self.append_to_excel(filename, row)
-
-    def start(self):
-        """Start the scraping process."""
-        self.scrape()
-        self.save_to_excel()
-        print("Scraping and saving complete!")
-
-desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
-desktop_path = desktop_path.replace("\\", "\\\\")
-
-scraper = TalabatAddonScraper(
-    url=vendor_url,
-    base_path=f"{desktop_path}\\{vendor_name}\\addons"
-)
-scraper.start()
\ No newline at end of file
+    scraper = TalabatAddonScraper(
+        url=vendor_url,
+        base_path=os.path.join(desktop_path, vendor_name, "addons"),
+        workers=scraper_workers,
+        engine=scraper_engine,
+        snapshot_path=os.path.join(desktop_path, vendor_name, "addons", "menu_snapshot.json") if scraper_incremental else None,
+        flush_rows=scraper_flush_rows
+    )
+    scraper.start()
\ No newline at end of file
@@ -0,0 +1,32 @@
+import re
+from functools import lru_cache
+
+DISALLOWED_CHARS = re.compile(r"[^a-zA-Z0-9_\-.\\ ]")
+WHITESPACE = re.compile(r"\s+")
+
+
+def sanitize_text(text: str, allow_spaces: bool = True) -> str:
+    sanitized = DISALLOWED_CHARS.sub("", text)
+    sanitized = WHITESPACE.sub(" ", sanitized).strip()
+    if not allow_spaces:
+        sanitized = sanitized.replace(" ", "_")
+    return sanitized
+
+
+def normalize_text(text):
+    return "".join(text.lower().split())
+
+
+def normalize_key(text):
+    """Case- and whitespace-insensitive key for any cell value."""
+    return normalize_text(str(text))
+
+
+@lru_cache(maxsize=65536)
+def canonical_key(text):
+    """Key used to match portal rows against spreadsheet values, computed once per distinct string."""
+    return sanitize_text(normalize_text(text))
+
+
+def addon_match_key(category, name, price, status):
+    return (canonical_key(category), canonical_key(name), str(price), status)